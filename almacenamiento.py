@@ -0,0 +1,390 @@
+import os
+import glob
+import json
+import time
+import sqlite3
+import logging
+import threading
+import pandas as pd
+
+from metricas import METRICS
+
+# Cargar datos JSON desde un archivo
+def load_json_data(filepath):
+    if os.path.exists(filepath):
+        with open(filepath, "r", encoding="utf-8") as json_file:
+            try:
+                data = json.load(json_file)
+                if not data:
+                    logging.info(f"El archivo {filepath} está vacío.")
+                    return {}
+                return data
+            except json.JSONDecodeError as e:
+                logging.error(f"Error al cargar JSON desde {filepath}: {e}")
+                return {}
+    else:
+        logging.info(f"El archivo {filepath} no existe.")
+        return {}
+
+# Guardar datos JSON en un archivo
+def save_json_data(filepath, data):
+    with open(filepath, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, ensure_ascii=False, indent=4)
+
+# Guardar datos JSON de forma atómica (archivo temporal + rename)
+def save_json_data_atomic(filepath, data):
+    tmp_filepath = filepath + ".tmp"
+    with METRICS.timer("json_save"):
+        with open(tmp_filepath, "w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, ensure_ascii=False, indent=4)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_filepath, filepath)
+
+
+# Campos de reseñas (--reviews): una tarjeta sin ellos (reseñas no pedidas o
+# descarga fallida) conserva los que ya tenía su registro en el maestro
+REVIEW_FIELDS = ("reviews", "first_comment_date")
+
+def keep_review_fields(card, previous):
+    if "reviews" in card or not previous or not isinstance(previous.get("reviews"), list):
+        return card
+    return dict(card, **{field: previous.get(field) for field in REVIEW_FIELDS})
+
+
+# Almacén original: DataFrame completo reescrito en el JSON maestro tras cada página
+class JsonMasterStore:
+    def __init__(self, master_filepath):
+        self.master_filepath = master_filepath
+
+        # Cargar datos existentes del master
+        master_data = load_json_data(master_filepath)
+
+        # Convertir master_data a DataFrame
+        if master_data:
+            self.master_df = pd.DataFrame.from_dict(master_data, orient='index')
+            self.master_df.index.name = 'id'
+            self.master_df.reset_index(inplace=True)
+        else:
+            self.master_df = pd.DataFrame()
+
+    def __len__(self):
+        return len(self.master_df)
+
+    def add_cards(self, cards_data, observed_at=None):
+        # observed_at se ignora: el último registro de cada id gana
+        with METRICS.timer("pandas_merge"):
+            if "reviews" in self.master_df and any("reviews" not in card for card in cards_data):
+                previous = self.master_df.set_index("id")[[f for f in REVIEW_FIELDS if f in self.master_df]]
+                cards_data = [keep_review_fields(card, previous.loc[card["id"]].to_dict())
+                              if card.get("id") in previous.index else card for card in cards_data]
+
+            # Convertir cards_data a DataFrame
+            cards_df = pd.DataFrame(cards_data)
+
+            # Merge with master_df
+            if not self.master_df.empty:
+                self.master_df = pd.concat([self.master_df, cards_df], ignore_index=True)
+            else:
+                self.master_df = cards_df
+
+            # Eliminar duplicados basados en 'id'
+            self.master_df.drop_duplicates(subset='id', keep='last', inplace=True)
+
+        # Guardar el JSON maestro actualizado
+        with METRICS.timer("json_save"):
+            self.master_df.set_index('id', inplace=True)
+            self.master_df.to_json(self.master_filepath, orient='index', indent=4, force_ascii=False)
+            self.master_df.reset_index(inplace=True)  # Reset index for future concatenations
+
+        # Bytes escritos: el archivo completo se reescribe en cada página
+        return os.path.getsize(self.master_filepath)
+
+    def to_dataframe(self):
+        return self.master_df
+
+    def iter_locations(self):
+        if self.master_df.empty or 'latitude' not in self.master_df:
+            return
+        yield from zip(self.master_df['id'].tolist(), self.master_df['latitude'].tolist(),
+                       self.master_df['longitude'].tolist())
+
+    def close(self):
+        pass
+
+
+# Número de páginas agrupadas en cada fsync del log
+FSYNC_EVERY_PAGES = 20
+
+# Tamaño máximo de un segmento del log antes de rotarlo
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+# Log de solo-anexado: cada página se agrega al segmento activo y la
+# compactación pliega los segmentos cerrados en el snapshot deduplicado
+class ListingLog:
+    def __init__(self, snapshot_filepath, log_dir, fsync_every=FSYNC_EVERY_PAGES,
+                 max_segment_bytes=MAX_SEGMENT_BYTES, compact_interval=None):
+        """
+        - snapshot_filepath: JSON maestro deduplicado (mismo formato que el modo json).
+        - log_dir: directorio de los segmentos segment-XXXXXX.jsonl.
+        - compact_interval: segundos entre compactaciones en segundo plano (None = solo al cerrar).
+        """
+        self.snapshot_filepath = snapshot_filepath
+        self.log_dir = log_dir
+        self.fsync_every = fsync_every
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+        os.makedirs(log_dir, exist_ok=True)
+
+        # Ids conocidos (snapshot + segmentos) para poder contar sin cargar los registros
+        self.known_ids = set(load_json_data(snapshot_filepath).keys())
+        for segment in self._segments():
+            for record in self._read_segment(segment):
+                self.known_ids.add(record.get("id"))
+
+        self.pending_pages = 0
+        # Páginas escritas y páginas cubiertas por el último fsync: el escritor
+        # solo da un tile por terminado en el ledger cuando sus tarjetas están en disco
+        self.written_pages = 0
+        self.synced_pages = 0
+        self.active_file = None
+        self._open_new_segment()
+
+        self.stop_event = threading.Event()
+        self.compactor = None
+        if compact_interval:
+            self.compactor = threading.Thread(target=self._compact_loop, args=(compact_interval,),
+                                              name="listing-log-compactor", daemon=True)
+            self.compactor.start()
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.log_dir, "segment-*.jsonl")))
+
+    def _read_segment(self, segment):
+        with open(segment, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Una línea incompleta al final indica una caída durante la escritura
+                    logging.warning(f"Línea corrupta ignorada en {segment}")
+
+    def _open_new_segment(self):
+        segments = self._segments()
+        last = int(os.path.basename(segments[-1])[8:14]) if segments else 0
+        path = os.path.join(self.log_dir, f"segment-{last + 1:06d}.jsonl")
+        self.active_file = open(path, "a", encoding="utf-8")
+
+    def _sync(self):
+        self.active_file.flush()
+        os.fsync(self.active_file.fileno())
+        self.pending_pages = 0
+        self.synced_pages = self.written_pages
+
+    def __len__(self):
+        return len(self.known_ids)
+
+    def add_cards(self, cards_data, observed_at=None):
+        # Costo constante por página: solo se escriben los registros nuevos.
+        # observed_at se ignora: en la compactación el último registro de cada id gana
+        lines = "".join(json.dumps(card, ensure_ascii=False) + "\n" for card in cards_data)
+        with self.lock:
+            self.active_file.write(lines)
+            self.known_ids.update(card["id"] for card in cards_data)
+            self.pending_pages += 1
+            self.written_pages += 1
+            if self.pending_pages >= self.fsync_every:
+                self._sync()
+            if self.active_file.tell() >= self.max_segment_bytes:
+                self._rotate()
+        return len(lines.encode("utf-8"))
+
+    def _rotate(self):
+        self._sync()
+        self.active_file.close()
+        self._open_new_segment()
+
+    def compact(self):
+        """
+        Pliega los segmentos cerrados en el snapshot (el último registro por id gana)
+        """
+        with self.compact_lock:
+            with self.lock:
+                # Cerrar el segmento activo para que también se pliegue
+                self._rotate()
+                sealed = [s for s in self._segments() if s != self.active_file.name]
+            if not sealed:
+                return
+
+            snapshot = load_json_data(self.snapshot_filepath)
+            for segment in sealed:
+                for record in self._read_segment(segment):
+                    record = dict(record)
+                    listing_id = record.pop("id", None)
+                    if listing_id is not None:
+                        snapshot[listing_id] = keep_review_fields(record, snapshot.get(listing_id))
+
+            save_json_data_atomic(self.snapshot_filepath, snapshot)
+            for segment in sealed:
+                os.remove(segment)
+            logging.info(f"Compactación: {len(sealed)} segmentos plegados, {len(snapshot)} listados en el snapshot.")
+
+    def _compact_loop(self, interval):
+        while not self.stop_event.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f"Error en la compactación del log: {e}")
+
+    def iter_locations(self):
+        # El último registro de cada id gana, igual que en la compactación
+        coordinates = {}
+        for listing_id, record in load_json_data(self.snapshot_filepath).items():
+            coordinates[listing_id] = (record.get("latitude"), record.get("longitude"))
+        with self.lock:
+            self.active_file.flush()
+        for segment in self._segments():
+            for record in self._read_segment(segment):
+                coordinates[record.get("id")] = (record.get("latitude"), record.get("longitude"))
+        for listing_id, (lat, lng) in coordinates.items():
+            yield listing_id, lat, lng
+
+    def to_dataframe(self):
+        self.compact()
+        master_df = pd.DataFrame.from_dict(load_json_data(self.snapshot_filepath), orient='index')
+        master_df.index.name = 'id'
+        return master_df.reset_index()
+
+    def close(self):
+        self.stop_event.set()
+        if self.compactor is not None:
+            self.compactor.join()
+        self.compact()
+        with self.lock:
+            self._sync()
+            self.active_file.close()
+            if os.path.getsize(self.active_file.name) == 0:
+                os.remove(self.active_file.name)
+
+
+# Maestro indexado en SQLite: id como clave primaria y upsert que conserva
+# la observación de mayor zoom (o la más reciente si el zoom es igual).
+# Una tarjeta sin reseñas conserva las que ya tenía el registro (REVIEW_FIELDS)
+class SQLiteMasterStore:
+    UPSERT_SQL = """
+        INSERT INTO listings (id, zoom_level, observed_at, latitude, longitude, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            zoom_level = excluded.zoom_level,
+            observed_at = excluded.observed_at,
+            latitude = excluded.latitude,
+            longitude = excluded.longitude,
+            data = CASE
+                WHEN json_type(excluded.data, '$.reviews') IS NULL
+                     AND json_type(listings.data, '$.reviews') = 'array'
+                THEN json_set(excluded.data,
+                              '$.reviews', json(json_extract(listings.data, '$.reviews')),
+                              '$.first_comment_date', json_extract(listings.data, '$.first_comment_date'))
+                ELSE excluded.data
+            END
+        WHERE excluded.zoom_level > listings.zoom_level
+           OR (excluded.zoom_level = listings.zoom_level AND excluded.observed_at >= listings.observed_at)
+    """
+
+    def __init__(self, db_filepath, export_filepath=None):
+        """
+        - db_filepath: base de datos SQLite del maestro.
+        - export_filepath: JSON maestro. Si la base está vacía se importa de él,
+          y al cerrar se exporta de nuevo para mantener el formato original.
+        """
+        self.db_filepath = db_filepath
+        self.export_filepath = export_filepath
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_filepath, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                id TEXT PRIMARY KEY,
+                zoom_level INTEGER NOT NULL DEFAULT 0,
+                observed_at REAL NOT NULL,
+                latitude REAL,
+                longitude REAL,
+                data TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+        if export_filepath and len(self) == 0 and os.path.exists(export_filepath):
+            self.import_json(export_filepath)
+
+    def _row(self, card, observed_at):
+        return (
+            str(card["id"]),
+            int(card.get("zoom_level") or 0),
+            observed_at,
+            card.get("latitude"),
+            card.get("longitude"),
+            json.dumps(card, ensure_ascii=False),
+        )
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def add_cards(self, cards_data, observed_at=None):
+        # Una transacción por página
+        observed_at = observed_at if observed_at is not None else time.time()
+        rows = [self._row(card, observed_at) for card in cards_data if card.get("id") is not None]
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(self.UPSERT_SQL, rows)
+        # Bytes de los registros enviados (sin contar índices ni el WAL)
+        return sum(len(row[5].encode("utf-8")) for row in rows)
+
+    def get(self, listing_id):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM listings WHERE id = ?", (str(listing_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_records(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM listings ORDER BY id").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def iter_locations(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, latitude, longitude FROM listings WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+            ).fetchall()
+        yield from rows
+
+    def import_json(self, filepath):
+        """
+        Importa un JSON maestro (id -> registro) con la misma regla de upsert
+        """
+        master_data = load_json_data(filepath)
+        cards = [dict(record, id=listing_id) for listing_id, record in master_data.items()]
+        # Los registros importados cuentan como observaciones antiguas
+        self.add_cards(cards, observed_at=0.0)
+        logging.info(f"Importados {len(cards)} listados desde {filepath}.")
+
+    def export_json(self, filepath):
+        master_data = {}
+        for record in self.iter_records():
+            listing_id = record.pop("id")
+            master_data[listing_id] = record
+        save_json_data_atomic(filepath, master_data)
+        logging.info(f"Exportados {len(master_data)} listados a {filepath}.")
+
+    def to_dataframe(self):
+        return pd.DataFrame(list(self.iter_records()))
+
+    def close(self):
+        if self.export_filepath:
+            self.export_json(self.export_filepath)
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+import psutil
+
+
+# Función que reserva un puerto libre para el servidor local
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Los módulos del scraper leen AIRBNB_BASE_URL al importarse: el benchmark nunca
+# debe tocar airbnb.com.co, así que la URL del servidor local se fija antes
+BENCH_PORT = int(os.environ.get("BENCH_PORT") or _free_port())
+os.environ["AIRBNB_BASE_URL"] = f"http://127.0.0.1:{BENCH_PORT}"
+
+from main import MasterWriter, build_cards, build_tile, open_master_store, parse_search_page, process_tile, \
+    setup_webdriver, STORAGE_MODES
+from enriquecimiento import AirbnbScraper
+from resenas import ReviewFetcher
+from limitador import SHARED_LIMITER, limited_get, with_retries
+from ledger_tiles import TileLedger
+from tiles import ResumeCursor
+from generador_urls import (generate_airbnb_urls, south_latitude, north_latitude, west_longitude,
+                            east_longitude, tile_size_latitude, tile_size_longitude)
+from metricas import METRICS
+from perfilado import profiler_from_options
+from servidor_local import DEFAULT_LISTINGS, DEFAULT_SEED, FixtureServer, SyntheticCity
+
+# Zoom de los tiles que se visitan y número de páginas por defecto
+BENCH_ZOOM = 16
+BENCH_PAGES = 100
+
+# Ritmo por host frente al servidor local (sin freno real: se mide el código, no la cortesía)
+BENCH_RATE = 1e6
+
+# Intervalo de muestreo de memoria (segundos)
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Etapas disponibles
+STAGES = ("urls", "search", "merge")
+
+
+# Muestreo en segundo plano del RSS máximo del proceso y sus hijos (navegador incluido)
+class PeakMemory:
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self):
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, self._rss())
+            self.stopped.wait(self.interval)
+
+    def reset(self):
+        # El pico de la etapa siguiente parte del uso actual
+        self.peak = self._rss()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+# Función que resume una etapa: ritmo, percentiles y pico de memoria
+def stage_report(name, seconds, latencies, pages, listings, memory):
+    latencies_ms = np.asarray(latencies, dtype=float) * 1000
+    report = {
+        "stage": name,
+        "seconds": round(seconds, 3),
+        "pages": pages,
+        "listings": listings,
+        "pages_per_s": round(pages / seconds, 2) if seconds else None,
+        "listings_per_s": round(listings / seconds, 2) if seconds else None,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2) if len(latencies_ms) else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2) if len(latencies_ms) else None,
+        "peak_rss_mb": round(memory.peak / 1024 ** 2, 1),
+    }
+    return report
+
+
+# Etapa 1: generación de la grilla de tiles en memoria
+def bench_urls(zoom_levels, memory):
+    memory.reset()
+    latencies = []
+    tiles = 0
+    start = time.perf_counter()
+    for zoom_level in zoom_levels:
+        began = time.perf_counter()
+        urls = generate_airbnb_urls(south_latitude, north_latitude, west_longitude, east_longitude,
+                                    tile_size_latitude, tile_size_longitude, [zoom_level])
+        latencies.append(time.perf_counter() - began)
+        tiles += len(urls[zoom_level])
+    # En esta etapa una "página" es un nivel de zoom y un "listado" es un tile
+    return stage_report("urls", time.perf_counter() - start, latencies, len(zoom_levels), tiles, memory)
+
+
+# Función que elige los tiles a visitar (muestra reproducible de la grilla)
+def sample_tiles(zoom_level, pages, seed):
+    rows = generate_airbnb_urls(south_latitude, north_latitude, west_longitude, east_longitude,
+                                tile_size_latitude, tile_size_longitude, [zoom_level])[zoom_level]
+    rows = random.Random(seed).sample(rows, min(pages, len(rows)))
+    return [build_tile(row) for row in rows]
+
+
+# Etapa 2: página de búsqueda + extracción + enriquecimiento (+ reseñas)
+def bench_search(tiles, memory, reviews=False, browser=False):
+    memory.reset()
+    scraper = AirbnbScraper()
+    review_fetcher = ReviewFetcher(session=scraper.session) if reviews else None
+    driver = setup_webdriver() if browser else None
+    pages = []
+    latencies = []
+    start = time.perf_counter()
+    try:
+        for tile in tiles:
+            began = time.perf_counter()
+            if driver is not None:
+                # Camino completo del scraper: driver.get, espera y extract_listings
+                cards_data = process_tile(driver, tile, scraper, review_fetcher)
+            else:
+                with METRICS.timer("search_fetch"):
+                    r = with_retries(lambda: limited_get(scraper.session, tile["url"], timeout=30),
+                                     description=f"Búsqueda {tile['tile_id']}")
+                METRICS.inc("pages")
+                cards_data = build_cards(parse_search_page(r.text), tile["sw_lat"], tile["sw_lng"],
+                                         tile["ne_lat"], tile["ne_lng"], tile["zoom_level"],
+                                         scraper, review_fetcher)
+            latencies.append(time.perf_counter() - began)
+            pages.append((tile, cards_data))
+    finally:
+        if driver is not None:
+            driver.quit()
+    listings = sum(len(cards_data) for _, cards_data in pages)
+    report = stage_report("search", time.perf_counter() - start, latencies, len(pages), listings, memory)
+    return report, pages
+
+
+# Etapa 3: fusión en el maestro (MasterWriter + ledger) con cada modo de almacenamiento
+def bench_merge(pages, storage, memory):
+    memory.reset()
+    with tempfile.TemporaryDirectory() as work_dir:
+        master_filepath = os.path.join(work_dir, "airbnb_master_listings.json")
+        ledger = TileLedger(os.path.join(work_dir, "tile_ledger.sqlite"))
+        store = open_master_store(storage, master_filepath)
+        writer = MasterWriter(store, ledger, ResumeCursor(ledger.get_cursor, ledger.set_cursor))
+        latencies = []
+        start = time.perf_counter()
+        for tile, cards_data in pages:
+            began = time.perf_counter()
+            ledger.lease(tile)
+            writer.handle_result(tile, cards_data)
+            latencies.append(time.perf_counter() - began)
+        # El cierre incluye la exportación final del maestro
+        store.to_dataframe()
+        store.close()
+        writer.release_synced()
+        seconds = time.perf_counter() - start
+        ledger.close()
+    listings = sum(len(cards_data) for _, cards_data in pages)
+    return stage_report(f"merge[{storage}]", seconds, latencies, len(pages), listings, memory)
+
+
+# Función que imprime los resultados en una tabla
+def print_reports(reports):
+    columns = ("stage", "seconds", "pages", "listings", "pages_per_s", "listings_per_s",
+               "p50_ms", "p99_ms", "peak_rss_mb")
+    widths = [max(len(column), *(len(str(report[column])) for report in reports)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for report in reports:
+        print("  ".join(str(report[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del scraper contra el servidor local (sin red)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"Etapas separadas por coma (por defecto {','.join(STAGES)})")
+    parser.add_argument("--pages", type=int, default=BENCH_PAGES,
+                        help=f"Tiles (páginas de búsqueda) a visitar (por defecto {BENCH_PAGES})")
+    parser.add_argument("--zoom", type=int, default=BENCH_ZOOM,
+                        help=f"Zoom de los tiles visitados (por defecto {BENCH_ZOOM})")
+    parser.add_argument("--url-zooms", default="14,16,18,20",
+                        help="Zooms de la etapa de generación de tiles")
+    parser.add_argument("--storage", default=",".join(STORAGE_MODES),
+                        help="Modos de almacenamiento de la etapa de fusión")
+    parser.add_argument("--reviews", action="store_true", help="Incluye la descarga de reseñas completas")
+    parser.add_argument("--browser", action="store_true",
+                        help="Visita las páginas con Firefox (process_tile) en vez de HTTP directo")
+    parser.add_argument("--listings", type=int, default=DEFAULT_LISTINGS,
+                        help=f"Publicaciones de la ciudad sintética (por defecto {DEFAULT_LISTINGS})")
+    parser.add_argument("--recorded", metavar="DIR", default=None,
+                        help="Caché de respuestas grabada con --response-cache para servir tal cual")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por petición del servidor")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación uniforme de la espera")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--profile", metavar="CARPETA", default=None,
+                        help="Perfila las etapas durante el benchmark (pilas plegadas y tracemalloc)")
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados (para CI)")
+    parser.add_argument("--verbose", action="store_true", help="Muestra el log del scraper")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"Etapas desconocidas: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Sin techo de ritmo: el servidor local responde tan rápido como puede
+    SHARED_LIMITER.initial_rate = BENCH_RATE
+    SHARED_LIMITER.max_rate = BENCH_RATE
+
+    server = FixtureServer(port=BENCH_PORT, city=SyntheticCity(args.listings, args.seed),
+                           recorded_dir=args.recorded, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+    server.start()
+    memory = PeakMemory().start()
+    profiler = profiler_from_options(args.profile)
+    if profiler is not None:
+        profiler.start()
+    reports = []
+    try:
+        if "urls" in stages:
+            reports.append(bench_urls([int(z) for z in args.url_zooms.split(",")], memory))
+        if "search" in stages or "merge" in stages:
+            tiles = sample_tiles(args.zoom, args.pages, args.seed)
+            report, pages = bench_search(tiles, memory, reviews=args.reviews, browser=args.browser)
+            if "search" in stages:
+                reports.append(report)
+            if "merge" in stages:
+                for storage in args.storage.split(","):
+                    reports.append(bench_merge(pages, storage.strip(), memory))
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        memory.stop()
+        server.stop()
+
+    print_reports(reports)
+    if args.output:
+        result = {
+            "params": {key: value for key, value in vars(args).items() if key not in ("output", "verbose", "profile")},
+            "server_requests": server.requests,
+            # Tiempos por etapa y contadores internos del scraper durante el benchmark
+            "metrics": METRICS.snapshot(),
+            "stages": reports,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+# Grupos de campos que se guardan (y expiran) juntos
+FIELD_GROUPS = {
+    "coordinates": ("latitude", "longitude"),
+    "review": ("last_comment_date", "review_count", "overall_rating"),
+    "detail": ("title", "room_description", "room_type", "person_capacity"),
+    "review_history": ("reviews",),  # Reseñas completas (ReviewFetcher)
+}
+
+# Tiempo de vida por grupo en segundos (None = nunca expira)
+DEFAULT_TTLS = {
+    "coordinates": None,  # Las coordenadas de una publicación no cambian
+    "review": 7 * 24 * 3600,
+    "detail": 30 * 24 * 3600,
+    "review_history": 7 * 24 * 3600,
+}
+
+# Número máximo de publicaciones que se conservan en la caché
+DEFAULT_MAX_LISTINGS = 500_000
+
+
+# Caché persistente id -> coordenadas / reseña / detalle de la publicación
+class ListingCache:
+    def __init__(self, filepath, ttls=None, max_listings=DEFAULT_MAX_LISTINGS):
+        self.filepath = filepath
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_listings = max_listings
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS listing_cache (
+                id TEXT NOT NULL,
+                field_group TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (id, field_group)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS listing_access (
+                id TEXT PRIMARY KEY,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_listing_access ON listing_access (accessed_at)")
+        # Validadores HTTP (ETag / Last-Modified) para peticiones condicionales,
+        # con la publicación a la que pertenecen para eliminarlos junto con ella
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                listing_id TEXT
+            )
+        """)
+        # Cachés creadas antes de asociar los validadores a la publicación:
+        # el id es el último segmento de la URL /rooms/{id}
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(http_validators)")}
+        if "listing_id" not in columns:
+            self.conn.execute("ALTER TABLE http_validators ADD COLUMN listing_id TEXT")
+            self.conn.execute(
+                "UPDATE http_validators SET listing_id = replace(url, rtrim(url, replace(url, '/', '')), '')"
+            )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_http_validators_listing ON http_validators (listing_id)")
+        self.conn.commit()
+
+    def _is_fresh(self, group, updated_at, now):
+        ttl = self.ttls.get(group)
+        return ttl is None or now - updated_at < ttl
+
+    def get_many(self, ids, groups=None, include_stale=False):
+        """
+        Retorna id -> campos vigentes en caché para los grupos pedidos.
+        Solo se incluyen las publicaciones que tienen todos los grupos vigentes
+        (o todos los grupos, vencidos o no, con include_stale).
+        """
+        groups = tuple(groups or FIELD_GROUPS)
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self.lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT id, field_group, value, updated_at FROM listing_cache "
+                    f"WHERE id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for listing_id, group, value, updated_at in rows:
+                    if group in groups and (include_stale or self._is_fresh(group, updated_at, now)):
+                        found.setdefault(listing_id, {})[group] = json.loads(value)
+
+            hits = {}
+            for listing_id, cached in found.items():
+                if len(cached) == len(groups):
+                    hits[listing_id] = {k: v for group in groups for k, v in cached[group].items()}
+
+            if hits and not include_stale:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO listing_access (id, accessed_at) VALUES (?, ?)",
+                    [(listing_id, now) for listing_id in hits],
+                )
+                self.conn.commit()
+        return hits
+
+    def put_many(self, rooms):
+        """
+        Guarda id -> campos de la publicación en una sola transacción
+        """
+        if not rooms:
+            return
+        now = time.time()
+        rows = []
+        stored = []
+        for listing_id, room in rooms.items():
+            if "latitude" in room and not (room.get("latitude") or room.get("longitude")):
+                continue  # No guardar publicaciones que fallaron (0.0, 0.0)
+            stored.append(listing_id)
+            for group, fields in FIELD_GROUPS.items():
+                if all(field in room for field in fields):
+                    value = json.dumps({field: room[field] for field in fields}, ensure_ascii=False)
+                    rows.append((listing_id, group, value, now))
+
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO listing_cache (id, field_group, value, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO listing_access (id, accessed_at) VALUES (?, ?)",
+                    [(listing_id, now) for listing_id in stored],
+                )
+            self._evict()
+
+    def get_validators(self, url):
+        """
+        Retorna (etag, last_modified) guardados para la URL, o (None, None)
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified FROM http_validators WHERE url = ?",
+                                    (url,)).fetchone()
+        return row if row else (None, None)
+
+    def put_validators(self, url, etag, last_modified, listing_id=None):
+        """
+        - listing_id: publicación de la URL; sus validadores se eliminan cuando se desaloja.
+        """
+        if not etag and not last_modified:
+            return
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO http_validators (url, etag, last_modified, listing_id) "
+                    "VALUES (?, ?, ?, ?)",
+                    (url, etag, last_modified, listing_id),
+                )
+
+    def _evict(self):
+        # Eliminar las publicaciones usadas hace más tiempo si se supera el límite
+        total = self.conn.execute("SELECT COUNT(*) FROM listing_access").fetchone()[0]
+        excess = total - self.max_listings
+        if excess <= 0:
+            return
+        with self.conn:
+            self.conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS evicted (id TEXT PRIMARY KEY)"
+            )
+            self.conn.execute("DELETE FROM evicted")
+            self.conn.execute(
+                "INSERT INTO evicted SELECT id FROM listing_access ORDER BY accessed_at LIMIT ?",
+                (excess,),
+            )
+            self.conn.execute("DELETE FROM listing_cache WHERE id IN (SELECT id FROM evicted)")
+            self.conn.execute("DELETE FROM listing_access WHERE id IN (SELECT id FROM evicted)")
+            self.conn.execute("DELETE FROM http_validators WHERE listing_id IN (SELECT id FROM evicted)")
+        logging.info(f"Caché de publicaciones: {excess} publicaciones eliminadas por tamaño.")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Nivel de compresión de los cuerpos guardados (zlib)
+COMPRESSION_LEVEL = 6
+
+# Tipos de respuesta: HTTP (requests) y páginas de búsqueda tomadas del navegador
+HTTP = "http"
+SEARCH_PAGE = "search"
+
+
+# La respuesta no está en la caché (modo sin red)
+class NotCachedError(Exception):
+    pass
+
+
+# Caché de respuestas en disco: cada cuerpo se guarda comprimido una sola vez
+# con su SHA-256 como nombre, y un índice SQLite asocia cada URL a su cuerpo
+class ResponseCache:
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.blob_dir = os.path.join(root_dir, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root_dir, "index.sqlite"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                content_type TEXT,
+                fetched_at REAL NOT NULL,
+                meta TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_kind ON responses (kind, fetched_at)")
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest[2:] + ".z")
+
+    def put(self, url, body, kind=HTTP, status=200, content_type=None, meta=None):
+        """
+        - body: bytes o str (se guarda en UTF-8).
+        - meta: diccionario opcional (por ejemplo, el bbox del tile de una página de búsqueda).
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as blob:
+                blob.write(zlib.compress(body, COMPRESSION_LEVEL))
+            os.replace(tmp_path, path)
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (url, kind, digest, status, content_type, fetched_at, meta) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, kind, digest, status, content_type, time.time(),
+                     json.dumps(meta, ensure_ascii=False) if meta is not None else None),
+                )
+        return digest
+
+    def read_body(self, digest):
+        with open(self._blob_path(digest), "rb") as blob:
+            return zlib.decompress(blob.read())
+
+    def _entry(self, row):
+        url, kind, digest, status, content_type, fetched_at, meta = row
+        return {
+            "url": url,
+            "kind": kind,
+            "digest": digest,
+            "status": status,
+            "content_type": content_type,
+            "fetched_at": fetched_at,
+            "meta": json.loads(meta) if meta else None,
+        }
+
+    def get(self, url):
+        """
+        Retorna la entrada de la URL con su cuerpo (bytes) en "body", o None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url, kind, digest, status, content_type, fetched_at, meta FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = self._entry(row)
+        entry["body"] = self.read_body(entry["digest"])
+        return entry
+
+    def iter_entries(self, kind):
+        """
+        Recorre las entradas de un tipo en orden de descarga (sin cargar los cuerpos)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url, kind, digest, status, content_type, fetched_at, meta FROM responses "
+                "WHERE kind = ? ORDER BY fetched_at",
+                (kind,),
+            ).fetchall()
+        for row in rows:
+            yield self._entry(row)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# Sesión de requests que guarda cada respuesta 200 en la caché. En modo sin red
+# (offline) responde solo desde la caché y lanza NotCachedError si falta.
+class CachingSession:
+    def __init__(self, session, cache, offline=False):
+        self.session = session
+        self.cache = cache
+        self.offline = offline
+
+    def __getattr__(self, name):
+        # headers, mount, etc. se delegan a la sesión original
+        return getattr(self.session, name)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        if self.offline:
+            entry = self.cache.get(full_url)
+            if entry is None:
+                raise NotCachedError(full_url)
+            response = requests.Response()
+            response.status_code = entry["status"]
+            response._content = entry["body"]
+            response.headers = CaseInsensitiveDict({"Content-Type": entry["content_type"] or ""})
+            response.url = full_url
+            response.encoding = "utf-8"
+            return response
+
+        response = self.session.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 200:
+            self.cache.put(full_url, response.content, HTTP, response.status_code,
+                           response.headers.get("Content-Type"))
+        return response
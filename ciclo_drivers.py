@@ -0,0 +1,152 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from metricas import METRICS
+
+# Páginas tras las cuales se recicla el driver, y RSS máximo (MB) del árbol de
+# procesos del navegador (geckodriver + Firefox + procesos de contenido)
+DRIVER_MAX_PAGES = 500
+DRIVER_MAX_RSS_MB = 1500
+
+# Páginas entre mediciones del RSS del árbol (recorrer los procesos cuesta ~1 ms)
+RSS_CHECK_EVERY = 5
+
+# Fracción de cualquiera de los dos límites a partir de la cual se lanza el driver
+# de reserva, para que esté listo al reciclar sin tener un Firefox ocioso todo el tiempo.
+# Con 0 siempre hay una reserva lista, también para reemplazar un driver caído
+STANDBY_LEAD = 0.8
+
+
+# Función que retorna los procesos del driver: geckodriver y todos sus descendientes
+def driver_process_tree(driver):
+    process = getattr(getattr(driver, "service", None), "process", None)
+    if process is None:
+        return []
+    try:
+        root = psutil.Process(process.pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+# Función que mide el RSS (MB) de todo el árbol de procesos del navegador
+def driver_rss_mb(driver):
+    total = 0
+    for process in driver_process_tree(driver):
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / 1024 ** 2
+
+
+# Ciclo de vida de un driver: lo recicla tras max_pages páginas o cuando el
+# árbol del navegador pasa de max_rss_mb, y lanza de antemano un driver de
+# reserva para que el cambio no pague el arranque en frío de Firefox.
+# La reserva existe a partir de standby_lead de un límite: un driver que falla
+# antes (WebDriverException) se reemplaza con un arranque en frío, salvo con
+# standby_lead=0, que mantiene siempre una reserva lista.
+# Cada hilo que navega (el bucle secuencial o un worker del pool) usa el suyo.
+class DriverManager:
+    def __init__(self, setup_driver, max_pages=DRIVER_MAX_PAGES, max_rss_mb=DRIVER_MAX_RSS_MB,
+                 standby=True, name="driver", standby_lead=STANDBY_LEAD):
+        """
+        - setup_driver: función que crea un driver nuevo.
+        - max_pages, max_rss_mb: límites de reciclaje (None o 0 desactiva cada uno).
+        - standby: lanza el driver de reserva en segundo plano antes de reciclar.
+        - standby_lead: fracción de un límite desde la que se lanza la reserva
+          (0 = siempre hay una, a costa de un Firefox ocioso por driver).
+        """
+        self.setup_driver = setup_driver
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.standby = standby
+        self.standby_lead = standby_lead
+        self.name = name
+        self.driver = None
+        self.pages = 0
+        self.rss_mb = 0.0
+        self.standby_future = None
+        # Un hilo arranca la reserva y otro cierra los drivers retirados, sin frenar la navegación
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"{name}-ciclo")
+
+    def _launch(self):
+        with METRICS.timer("driver_setup"):
+            return self.setup_driver()
+
+    def _prelaunch(self):
+        if self.standby and self.standby_future is None:
+            logging.info(f"[{self.name}] Lanzando driver de reserva.")
+            self.standby_future = self.executor.submit(self._launch)
+
+    def _take_standby(self):
+        # Usa la reserva (esperando si aún arranca) o, si no hay, arranca en frío
+        future, self.standby_future = self.standby_future, None
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                logging.warning(f"[{self.name}] El driver de reserva no arrancó: {e}")
+        return self._launch()
+
+    def _retire(self, driver):
+        def quit_driver():
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.executor.submit(quit_driver)
+
+    def get(self):
+        """
+        Retorna el driver activo; lo crea (o promueve la reserva) si no hay
+        uno o si perdió la sesión
+        """
+        if self.driver is not None and self.driver.session_id is None:
+            logging.warning(f"[{self.name}] El driver ha perdido la sesión. Reemplazándolo...")
+            self.discard()
+        if self.driver is None:
+            self.driver = self._take_standby()
+            self.pages = 0
+            self.rss_mb = 0.0
+            if not self.standby_lead:
+                # Reserva siempre lista: el próximo cambio (reciclaje o caída) no arranca en frío
+                self._prelaunch()
+        return self.driver
+
+    def page_done(self):
+        # Llamar tras cada página visitada con el driver activo
+        self.pages += 1
+        if self.pages % RSS_CHECK_EVERY == 0:
+            self.rss_mb = driver_rss_mb(self.driver)
+            logging.info(f"[{self.name}] Memoria del navegador: {self.rss_mb:.0f} MB tras {self.pages} páginas.")
+
+        pages_limit = bool(self.max_pages) and self.pages >= self.max_pages
+        rss_limit = bool(self.max_rss_mb) and self.rss_mb >= self.max_rss_mb
+        if (self.max_pages and self.pages >= self.max_pages * self.standby_lead) or \
+                (self.max_rss_mb and self.rss_mb >= self.max_rss_mb * self.standby_lead):
+            self._prelaunch()
+        if pages_limit or rss_limit:
+            reason = "límite de páginas" if pages_limit else "límite de memoria"
+            logging.info(f"[{self.name}] Reciclando el driver ({reason}): {self.pages} páginas, "
+                         f"{self.rss_mb:.0f} MB.")
+            METRICS.inc("driver_recycles")
+            self.discard()
+
+    def discard(self):
+        # Retira el driver activo (por reciclaje o tras un WebDriverException)
+        if self.driver is not None:
+            self._retire(self.driver)
+            self.driver = None
+
+    def close(self):
+        self.discard()
+        if self.standby_future is not None:
+            future, self.standby_future = self.standby_future, None
+            try:
+                self._retire(future.result())
+            except Exception:
+                pass
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import time
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from limitador import RETRY_ATTEMPTS, SHARED_LIMITER, backoff_delay, limited_get
+from cache_respuestas import NotCachedError
+from metricas import METRICS
+
+# URL base de Airbnb Colombia (se puede apuntar a servidor_local.py con AIRBNB_BASE_URL)
+AIRBNB_BASE_URL = os.environ.get("AIRBNB_BASE_URL", "https://www.airbnb.com.co").rstrip("/")
+
+# Número máximo de peticiones simultáneas para enriquecer publicaciones
+COORDINATE_WORKERS = 16
+
+# Bloques JSON embebidos en la página de la publicación (data-deferred-state, data-state, ...)
+JSON_SCRIPT_PATTERN = re.compile(
+    r'<script[^>]*type="application/json"[^>]*>(.*?)</script>', re.DOTALL
+)
+LAT_PATTERN = re.compile(r'"lat":([-0-9.]+),')
+LNG_PATTERN = re.compile(r'"lng":([-0-9.]+),')
+
+# Campos que agrega la etapa de enriquecimiento a cada tarjeta
+ROOM_FIELDS = {
+    "latitude": 0.0,
+    "longitude": 0.0,
+    "last_comment_date": None,
+    "title": None,
+    "room_description": None,
+    "room_type": None,
+    "person_capacity": None,
+    "review_count": None,
+    "overall_rating": None,
+}
+
+
+# Grupos de la caché (cache_listados.FIELD_GROUPS) que llena la página /rooms/{id}
+ROOM_GROUPS = ("coordinates", "review", "detail")
+
+
+# Función para recorrer el JSON embebido sin recursión
+def _walk_json(node):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(v for v in current.values() if isinstance(v, (dict, list)))
+        elif isinstance(current, list):
+            stack.extend(v for v in current if isinstance(v, (dict, list)))
+
+
+def parse_room_page(html: str) -> dict:
+    """
+    Extrae coordenadas, fecha de la última reseña, título, descripción y
+    otros campos de los bloques JSON de la página /rooms/{id}
+    """
+    room = dict(ROOM_FIELDS)
+    review_dates = []
+
+    for block in JSON_SCRIPT_PATTERN.findall(html):
+        try:
+            payload = json.loads(block)
+        except ValueError:
+            continue
+
+        for node in _walk_json(payload):
+            if room["latitude"] == 0.0 and isinstance(node.get("lat"), (int, float)) \
+                    and isinstance(node.get("lng"), (int, float)):
+                room["latitude"], room["longitude"] = float(node["lat"]), float(node["lng"])
+            if room["title"] is None and isinstance(node.get("listingTitle"), str):
+                room["title"] = node["listingTitle"]
+            if room["title"] is None and node.get("__typename") == "PdpTitleSection" \
+                    and isinstance(node.get("title"), str):
+                room["title"] = node["title"]
+            if room["room_description"] is None and isinstance(node.get("htmlDescription"), dict):
+                room["room_description"] = node["htmlDescription"].get("htmlText")
+            if room["room_type"] is None and isinstance(node.get("roomTypeCategory"), str):
+                room["room_type"] = node["roomTypeCategory"]
+            if room["person_capacity"] is None and isinstance(node.get("personCapacity"), int):
+                room["person_capacity"] = node["personCapacity"]
+            if room["review_count"] is None and isinstance(node.get("reviewCount"), int):
+                room["review_count"] = node["reviewCount"]
+            if room["overall_rating"] is None and isinstance(node.get("overallRating"), (int, float)):
+                room["overall_rating"] = float(node["overallRating"])
+            # Las reseñas traen "comments" junto a su fecha de creación
+            if "comments" in node and isinstance(node.get("createdAt"), str):
+                review_dates.append(node["createdAt"])
+
+    # Respaldo: el patrón original sobre el texto plano
+    if room["latitude"] == 0.0:
+        lat_matches = LAT_PATTERN.findall(html)
+        lng_matches = LNG_PATTERN.findall(html)
+        if lat_matches and lng_matches:
+            room["latitude"], room["longitude"] = float(lat_matches[0]), float(lng_matches[0])
+
+    if review_dates:
+        room["last_comment_date"] = max(review_dates)
+
+    return room
+
+
+# Función que crea una sesión con pool de conexiones para max_workers hilos
+def make_session(max_workers=COORDINATE_WORKERS):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+    })
+    return session
+
+
+# Clase AirbnbScraper con el método extract_lat_lon
+class AirbnbScraper:
+    def __init__(self, max_workers=COORDINATE_WORKERS, cache=None, limiter=SHARED_LIMITER):
+        # Una sola sesión con pool de conexiones compartida por todos los hilos
+        self.max_workers = max_workers
+        self.cache = cache  # ListingCache opcional, se consulta antes de la red
+        self.limiter = limiter  # Ritmo por host compartido con las demás etapas
+        self.session = make_session(max_workers)
+
+    def fetch_room(self, idPublication, stale=None):
+        """
+        Descarga /rooms/{id} una sola vez y retorna todos los campos de la publicación.
+        - stale: campos vencidos en caché. Si el servidor entregó ETag o
+          Last-Modified, la petición es condicional y un 304 los reutiliza.
+        """
+        url = f"{AIRBNB_BASE_URL}/rooms/{idPublication}"
+        headers = {}
+        if stale is not None and self.cache is not None:
+            etag, last_modified = self.cache.get_validators(url)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        attempts = 0
+
+        while attempts < RETRY_ATTEMPTS:
+            try:
+                r = limited_get(self.session, url, self.limiter, headers=headers, timeout=30)
+                if r.status_code == 304:
+                    return dict(ROOM_FIELDS, **stale)
+                room = parse_room_page(r.text)
+                if self.cache is not None:
+                    self.cache.put_validators(url, r.headers.get("ETag"), r.headers.get("Last-Modified"),
+                                              idPublication)
+                if room["latitude"] or room["longitude"]:
+                    return room
+                raise ValueError("No se encontraron coordenadas.")
+            except Exception as e:
+                # Sin red (--replay) una respuesta que no se grabó se informa al llamador,
+                # que omite la publicación en vez de guardarla con campos por defecto
+                if isinstance(e, NotCachedError):
+                    raise
+                logging.warning(f'No hay coordenada, intento número: {attempts + 1}')
+                logging.warning(f'Error: {e}')
+                # La respuesta guardada no cambia: no tiene sentido reintentar
+                if getattr(self.session, "offline", False):
+                    break
+                # Espera exponencial con jitter; el limitador ya bajó el ritmo si hubo 403/429
+                time.sleep(backoff_delay(attempts))
+                attempts += 1
+                if attempts < RETRY_ATTEMPTS:
+                    METRICS.inc("retries")
+        return dict(ROOM_FIELDS)
+
+    def extract_lat_lon(self, idPublication):
+        room = self.fetch_room(idPublication)
+        return room["latitude"], room["longitude"]
+
+    def enrich_listings(self, ids, groups=None):
+        """
+        Enriquece un lote de publicaciones en paralelo.
+        Retorna un diccionario id -> campos de la página de la publicación.
+        Si hay caché, solo se descargan las publicaciones sin los grupos pedidos vigentes.
+        Sin red (--replay), las publicaciones cuya respuesta no se grabó no aparecen.
+        """
+        unique_ids = [i for i in dict.fromkeys(ids) if i != "unknown"]
+        rooms = {}
+        if not unique_ids:
+            return rooms
+
+        groups = groups or ROOM_GROUPS
+        stale = {}
+        if self.cache is not None:
+            rooms.update(self.cache.get_many(unique_ids, groups))
+        pending = [i for i in unique_ids if i not in rooms]
+        if self.cache is not None:
+            METRICS.inc("cache_hits", len(rooms))
+            METRICS.inc("cache_misses", len(pending))
+        if not pending:
+            return rooms
+        if self.cache is not None:
+            # Lo vencido sirve para la petición condicional
+            stale = self.cache.get_many(pending, ROOM_GROUPS, include_stale=True)
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            # Los workers cuentan en la etapa del llamador (enrich) para el perfilador
+            fetch_room = METRICS.propagate(self.fetch_room)
+            futures = {executor.submit(fetch_room, i, stale.get(i)): i for i in pending}
+            for future in as_completed(futures):
+                listing_id = futures[future]
+                try:
+                    fetched[listing_id] = future.result()
+                except NotCachedError:
+                    logging.warning(f"La publicación {listing_id} no está en la caché de respuestas; se omite.")
+                except Exception as e:
+                    logging.error(f"Error enriqueciendo la publicación {listing_id}: {e}")
+                    fetched[listing_id] = dict(ROOM_FIELDS)
+
+        if self.cache is not None:
+            self.cache.put_many(fetched)
+        rooms.update(fetched)
+        return rooms
+
+    def resolve_coordinates(self, ids):
+        """
+        Resuelve las coordenadas de un lote de publicaciones en paralelo.
+        Retorna un diccionario id -> (lat, lon)
+        """
+        rooms = self.enrich_listings(ids, groups=("coordinates",))
+        return {i: (room["latitude"], room["longitude"]) for i, room in rooms.items()}
+
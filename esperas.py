@@ -0,0 +1,131 @@
+import math
+import time
+import bisect
+import logging
+import threading
+
+from selectores import CARD_CLASSES
+
+# Estrategia de carga del driver: "eager" retorna en DOMContentLoaded, sin esperar imágenes ni iframes
+PAGE_LOAD_STRATEGY = "eager"
+
+# Límites del timeout adaptativo (segundos)
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 15.0
+DEFAULT_TIMEOUT = 10.0  # Hasta tener suficientes muestras
+
+# Muestras mínimas antes de adaptar el timeout, y margen sobre el percentil observado
+MIN_SAMPLES = 20
+TIMEOUT_PERCENTILE = 99
+TIMEOUT_MARGIN = 1.5
+
+# Tiempo que el número de tarjetas debe mantenerse estable para dar la página por lista
+STABLE_MS = 300
+POLL_INTERVAL = 0.1
+
+# Textos que muestra Airbnb cuando un tile no tiene resultados
+NO_RESULTS_MARKERS = ["No hay coincidencias exactas", "No hay resultados", "No exact matches"]
+
+# Una sola consulta al navegador por sondeo: número de tarjetas y marcador de "sin resultados".
+# La clase de la tarjeta llega como argumento desde selectores.CARD_CLASSES
+READINESS_SCRIPT = """
+const markers = arguments[0];
+const cards = document.getElementsByClassName(arguments[1]).length;
+let empty = false;
+if (cards === 0) {
+    for (const h of document.querySelectorAll('h1, h2, h3')) {
+        if (markers.some(m => h.innerText.includes(m))) { empty = true; break; }
+    }
+}
+return [cards, empty];
+"""
+
+
+# El tile no mostró tarjetas ni el aviso de "sin resultados" antes del timeout
+class ResultsTimeoutError(Exception):
+    pass
+
+
+# Histograma de latencias de carga con cubetas logarítmicas
+class LatencyHistogram:
+    def __init__(self, min_ms=10, max_ms=60_000, buckets_per_decade=20):
+        decades = math.log10(max_ms / min_ms)
+        count = int(decades * buckets_per_decade) + 1
+        self.bounds = [min_ms * 10 ** (i / buckets_per_decade) for i in range(count)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        index = bisect.bisect_left(self.bounds, seconds * 1000)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += 1
+
+    def percentile(self, p):
+        """
+        Retorna el percentil p (0-100) en segundos, o None si no hay muestras
+        """
+        with self.lock:
+            if self.total == 0:
+                return None
+            target = self.total * p / 100
+            accumulated = 0
+            for index, count in enumerate(self.counts):
+                accumulated += count
+                if accumulated >= target:
+                    bound = self.bounds[min(index, len(self.bounds) - 1)]
+                    return bound / 1000
+        return self.bounds[-1] / 1000
+
+    def timeout(self):
+        """
+        Timeout adaptado a lo observado: margen sobre el p99, acotado
+        """
+        if self.total < MIN_SAMPLES:
+            return DEFAULT_TIMEOUT
+        observed = self.percentile(TIMEOUT_PERCENTILE) * TIMEOUT_MARGIN
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, observed))
+
+    def summary(self):
+        if self.total == 0:
+            return "sin muestras"
+        return (f"n={self.total} p50={self.percentile(50):.2f}s p90={self.percentile(90):.2f}s "
+                f"p99={self.percentile(99):.2f}s timeout={self.timeout():.2f}s")
+
+
+def wait_for_results(driver, histogram, stable_ms=STABLE_MS, poll_interval=POLL_INTERVAL):
+    """
+    Espera a que el tile esté listo: tarjetas presentes y estables durante
+    stable_ms, o el marcador de "sin resultados". Retorna (estado, tarjetas)
+    donde estado es "cards", "empty" o "timeout".
+    """
+    start = time.monotonic()
+    deadline = start + histogram.timeout()
+    last_count = -1
+    stable_since = start
+
+    while True:
+        now = time.monotonic()
+        count, empty = driver.execute_script(READINESS_SCRIPT, NO_RESULTS_MARKERS, CARD_CLASSES["card"])
+
+        if empty:
+            histogram.record(now - start)
+            return "empty", 0
+
+        if count != last_count:
+            last_count = count
+            stable_since = now
+        elif count > 0 and (now - stable_since) * 1000 >= stable_ms:
+            # La latencia útil es cuándo dejaron de llegar tarjetas
+            histogram.record(stable_since - start)
+            return "cards", count
+
+        if now >= deadline:
+            logging.info(f"Timeout de {histogram.timeout():.2f}s esperando resultados ({count} tarjetas).")
+            # El timeout también cuenta como muestra: si solo se registraran las páginas
+            # que llegan a tiempo, el timeout adaptativo solo podría bajar
+            histogram.record(now - start)
+            return ("cards" if count > 0 else "timeout"), count
+
+        time.sleep(poll_interval)
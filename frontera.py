@@ -0,0 +1,124 @@
+import time
+import sqlite3
+import hashlib
+import threading
+import urllib.parse
+
+from paginacion import link_offset
+
+# Parámetros que cambian entre visitas sin cambiar la página (sesión, origen del clic, etc.)
+VOLATILE_PARAMS = {
+    "federated_search_session_id",
+    "search_type",
+    "source",
+    "pagination_search",
+    "cursor",
+    "section_offset",
+    "previous_page_section_name",
+    "update_selected_filters",
+    "_set_bev_on_new_domain",
+    "_intended_path",
+}
+
+# Parámetros del bbox que se redondean (6 decimales, igual que el id de los tiles)
+BBOX_PARAMS = ("ne_lat", "ne_lng", "sw_lat", "sw_lng")
+BBOX_DECIMALS = 6
+
+
+# Función que normaliza una URL de búsqueda: parámetros ordenados, bbox
+# redondeado, sin claves volátiles y con el desplazamiento explícito
+def canonical_url(url):
+    parts = urllib.parse.urlsplit(url)
+    params = {}
+    for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True):
+        if key in VOLATILE_PARAMS:
+            continue
+        if key in BBOX_PARAMS:
+            try:
+                value = f"{float(value):.{BBOX_DECIMALS}f}"
+            except ValueError:
+                pass
+        params.setdefault(key, []).append(value)
+
+    # El cursor y items_offset son dos formas de decir la misma página
+    params.pop("items_offset", None)
+    offset = link_offset(url)
+    if offset:
+        params["items_offset"] = [str(offset)]
+
+    query = urllib.parse.urlencode(
+        [(key, value) for key in sorted(params) for value in sorted(params[key])], safe=","
+    )
+    path = urllib.parse.unquote(parts.path).rstrip("/")
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+# Función que resume una URL canónica en un entero de 64 bits para el conjunto persistente
+def url_hash(url):
+    digest = hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+# Conjunto persistente de páginas visitadas (hash de la URL canónica), compartido
+# entre ejecuciones y archivos de zoom
+class VisitedUrls:
+    def __init__(self, filepath, max_age=None):
+        """
+        - max_age: segundos tras los cuales una página visitada vuelve a
+          considerarse pendiente (modo incremental). None = nunca.
+        """
+        self.filepath = filepath
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS visited_urls (
+                url_hash INTEGER PRIMARY KEY,
+                visited_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM visited_urls").fetchone()[0]
+
+    def __contains__(self, url):
+        visited_at = self.visited_at(url)
+        if visited_at is None:
+            return False
+        return self.max_age is None or time.time() - visited_at < self.max_age
+
+    def visited_at(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT visited_at FROM visited_urls WHERE url_hash = ?",
+                                    (url_hash(url),)).fetchone()
+        return row[0] if row else None
+
+    def add(self, url):
+        """
+        Registra la página como visitada (o renueva una visita vencida).
+        Retorna False si ya estaba vigente.
+        """
+        now = time.time()
+        stale_before = now - self.max_age if self.max_age is not None else float("-inf")
+        with self.lock:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "INSERT INTO visited_urls (url_hash, visited_at) VALUES (?, ?) "
+                    "ON CONFLICT(url_hash) DO UPDATE SET visited_at = excluded.visited_at "
+                    "WHERE visited_at < ?",
+                    (url_hash(url), now, stale_before),
+                )
+        return cursor.rowcount == 1
+
+    def discard(self, url):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM visited_urls WHERE url_hash = ?", (url_hash(url),))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,21 +1,18 @@
-import math
-import urllib.parse
 import os
-import json
-import time
+import argparse
+import urllib.parse
+import numpy as np
 from tqdm import tqdm
-from geopy.distance import geodesic
 
-# Clear the console (adjusted for both Unix and Windows systems)
-os.system("cls" if os.name == 'nt' else 'clear')
+from tiles import write_binary_tiles
 
 # Función para convertir diferencias de latitud y longitud a metros
-
+# (acepta escalares o arreglos de NumPy)
 def lat_lon_to_meters(lat_diff, lon_diff, avg_latitude):
     # Un grado de latitud equivale a 111,320 metros
     lat_meters = lat_diff * 111320
     # Un grado de longitud depende de la latitud (ajustado por coseno)
-    lon_meters = lon_diff * 111320 * math.cos(math.radians(avg_latitude))
+    lon_meters = lon_diff * 111320 * np.cos(np.radians(avg_latitude))
     return lat_meters, lon_meters
 
 # Función para ajustar el tamaño del tile en función del nivel de zoom
@@ -30,84 +27,165 @@ def adjust_tile_size_by_zoom(tile_size, zoom_level, base_zoom=22):
     zoom_factor = 2 ** (base_zoom - zoom_level)  # Cuanto más bajo el zoom, mayor el área
     return tile_size * zoom_factor
 
+# URL base de la búsqueda en Airbnb (AIRBNB_BASE_URL la apunta a otro servidor, como servidor_local.py)
+BASE_URL = (os.environ.get("AIRBNB_BASE_URL", "https://www.airbnb.com.co").rstrip("/")
+            + "/s/Bogotá--Bogotá--D.C.--Colombia/homes?")
+
+# Parámetros fijos de la búsqueda (iguales para todos los tiles)
+STATIC_PARAMS = {
+    'tab_id': 'home_tab',
+    'refinement_paths[]': '/homes',
+    'channel': 'EXPLORE',
+    'query': 'Bogotá, Bogotá, D.C.',
+    'place_id': 'ChIJKcumLf2bP44RFDmjIFVjnSM',
+    'source': 'structured_search_input_header',
+    'search_type': 'user_map_move',
+    'search_mode': 'regular_search',
+}
+
+# Filas de tiles (latitud) que se generan por bloque
+CHUNK_ROWS = 64
+
+# Función que arma la plantilla de URL: los parámetros fijos se codifican una sola vez
+def build_url_template(zoom_level):
+    encoded_static = urllib.parse.urlencode(STATIC_PARAMS, doseq=True, safe=',')
+    return (BASE_URL + encoded_static +
+            "&ne_lat={!r}&ne_lng={!r}&sw_lat={!r}&sw_lng={!r}"
+            f"&zoom={zoom_level}&zoom_level={zoom_level}&search_by_map=true")
+
+# Función que calcula la grilla de un nivel de zoom en bloques de arreglos de NumPy
+def iter_tile_chunks(
+    south_lat, north_lat, west_lng, east_lng,
+    tile_size_lat, tile_size_lng,
+    zoom_level, chunk_rows=CHUNK_ROWS
+):
+    """
+    Retorna bloques (diccionarios de arreglos) con sw_lat, sw_lng, ne_lat,
+    ne_lng y tile_area_m2, en el mismo orden que la grilla original
+    (fila por fila de latitud, de oeste a este).
+    """
+    # Ajusta el tamaño del tile para latitud y longitud según el nivel de zoom
+    tile_size_lat_zoomed = adjust_tile_size_by_zoom(tile_size_lat, zoom_level)
+    tile_size_lng_zoomed = adjust_tile_size_by_zoom(tile_size_lng, zoom_level)
+
+    lat_steps = int(np.ceil((north_lat - south_lat) / tile_size_lat_zoomed))
+    lng_steps = int(np.ceil((east_lng - west_lng) / tile_size_lng_zoomed))
+
+    # Las columnas son iguales para todas las filas
+    sw_lng_row = west_lng + np.arange(lng_steps) * tile_size_lng_zoomed
+    ne_lng_row = np.minimum(sw_lng_row + tile_size_lng_zoomed, east_lng)
+
+    for first_row in range(0, lat_steps, chunk_rows):
+        rows = np.arange(first_row, min(first_row + chunk_rows, lat_steps))
+        sw_lat_col = south_lat + rows * tile_size_lat_zoomed
+        ne_lat_col = np.minimum(sw_lat_col + tile_size_lat_zoomed, north_lat)
+
+        sw_lat = np.repeat(sw_lat_col, lng_steps)
+        ne_lat = np.repeat(ne_lat_col, lng_steps)
+        sw_lng = np.tile(sw_lng_row, len(rows))
+        ne_lng = np.tile(ne_lng_row, len(rows))
+
+        # Calcular el tamaño del tile en metros
+        avg_latitude = (sw_lat + ne_lat) / 2  # Promedio de latitudes para ajustar longitud
+        lat_meters, lon_meters = lat_lon_to_meters(ne_lat - sw_lat, ne_lng - sw_lng, avg_latitude)
+
+        yield {
+            'sw_lat': sw_lat,
+            'sw_lng': sw_lng,
+            'ne_lat': ne_lat,
+            'ne_lng': ne_lng,
+            'tile_area_m2': lat_meters * lon_meters,
+        }
+
+# Función que cuenta los tiles de un nivel de zoom sin generarlos
+def count_tiles_for_zoom(south_lat, north_lat, west_lng, east_lng, tile_size_lat, tile_size_lng, zoom_level):
+    tile_size_lat_zoomed = adjust_tile_size_by_zoom(tile_size_lat, zoom_level)
+    tile_size_lng_zoomed = adjust_tile_size_by_zoom(tile_size_lng, zoom_level)
+    lat_steps = int(np.ceil((north_lat - south_lat) / tile_size_lat_zoomed))
+    lng_steps = int(np.ceil((east_lng - west_lng) / tile_size_lng_zoomed))
+    return lat_steps * lng_steps
+
+# Función que convierte un bloque de arreglos en las líneas JSON del archivo de tiles
+def render_chunk_lines(chunk, zoom_level, url_template):
+    sw_lat = chunk['sw_lat'].tolist()
+    sw_lng = chunk['sw_lng'].tolist()
+    ne_lat = chunk['ne_lat'].tolist()
+    ne_lng = chunk['ne_lng'].tolist()
+    area = chunk['tile_area_m2'].tolist()
+    return [
+        f'{{"zoom_level": {zoom_level}, "sw_lat": {a!r}, "sw_lng": {b!r}, "ne_lat": {c!r}, '
+        f'"ne_lng": {d!r}, "tile_area_m2": {e!r}, "url": "{url_template.format(c, d, a, b)}"}}\n'
+        for a, b, c, d, e in zip(sw_lat, sw_lng, ne_lat, ne_lng, area)
+    ]
+
+# Función que escribe el archivo JSONL de un nivel de zoom bloque a bloque
+def write_tile_file(
+    json_file,
+    south_lat, north_lat, west_lng, east_lng,
+    tile_size_lat, tile_size_lng,
+    zoom_level
+):
+    url_template = build_url_template(zoom_level)
+    total_tiles = count_tiles_for_zoom(south_lat, north_lat, west_lng, east_lng,
+                                       tile_size_lat, tile_size_lng, zoom_level)
+    written = 0
+    with open(json_file, 'w', encoding='utf-8') as f, \
+            tqdm(total=total_tiles, desc=f'Processing Zoom Level {zoom_level}', unit='tile') as pbar:
+        for chunk in iter_tile_chunks(south_lat, north_lat, west_lng, east_lng,
+                                      tile_size_lat, tile_size_lng, zoom_level):
+            lines = render_chunk_lines(chunk, zoom_level, url_template)
+            f.writelines(lines)
+            written += len(lines)
+            pbar.update(len(lines))
+    return written
+
+# Función que escribe el archivo binario .tiles de un nivel de zoom (sin URLs)
+def write_binary_tile_file(
+    tiles_file,
+    south_lat, north_lat, west_lng, east_lng,
+    tile_size_lat, tile_size_lng,
+    zoom_level
+):
+    total_tiles = count_tiles_for_zoom(south_lat, north_lat, west_lng, east_lng,
+                                       tile_size_lat, tile_size_lng, zoom_level)
+    chunks = iter_tile_chunks(south_lat, north_lat, west_lng, east_lng,
+                              tile_size_lat, tile_size_lng, zoom_level)
+    with tqdm(total=total_tiles, desc=f'Processing Zoom Level {zoom_level}', unit='tile') as pbar:
+        def tracked(chunks):
+            for chunk in chunks:
+                yield chunk
+                pbar.update(len(chunk['sw_lat']))
+        return write_binary_tiles(tiles_file, zoom_level, total_tiles, tracked(chunks),
+                                  build_url_template(zoom_level), STATIC_PARAMS['place_id'])
+
 def generate_airbnb_urls(
     south_lat, north_lat, west_lng, east_lng,
     tile_size_lat, tile_size_lng,
     zoom_levels
 ):
+    """
+    Retorna zoom -> lista de tiles (diccionarios) en memoria.
+    Para zooms grandes conviene write_tile_file, que no guarda la grilla completa.
+    """
     all_urls_by_zoom = {}
 
     for zoom_level in zoom_levels:
         urls = []
-
-        # Ajusta el tamaño del tile para latitud y longitud según el nivel de zoom
-        tile_size_lat_zoomed = adjust_tile_size_by_zoom(tile_size_lat, zoom_level)
-        tile_size_lng_zoomed = adjust_tile_size_by_zoom(tile_size_lng, zoom_level)
-
-        lat_steps = int(math.ceil((north_lat - south_lat) / tile_size_lat_zoomed))
-        lng_steps = int(math.ceil((east_lng - west_lng) / tile_size_lng_zoomed))
-        
-        total_tiles = lat_steps * lng_steps  # Número total de tiles a procesar
-        start_time = time.time()  # Hora de inicio
-
-        # Barra de progreso con tqdm
-        with tqdm(total=total_tiles, desc=f'Processing Zoom Level {zoom_level}', unit='tile') as pbar:
-            for i in range(lat_steps):
-                for j in range(lng_steps):
-                    sw_lat = south_lat + i * tile_size_lat_zoomed
-                    sw_lng = west_lng + j * tile_size_lng_zoomed
-                    ne_lat = min(sw_lat + tile_size_lat_zoomed, north_lat)
-                    ne_lng = min(sw_lng + tile_size_lng_zoomed, east_lng)
-
-                    # Calcular el tamaño del tile en metros
-                    avg_latitude = (sw_lat + ne_lat) / 2  # Promedio de latitudes para ajustar longitud
-                    lat_meters, lon_meters = lat_lon_to_meters(ne_lat - sw_lat, ne_lng - sw_lng, avg_latitude)
-                    area_m2 = lat_meters * lon_meters
-
-                    # Construye la URL de Airbnb con los parámetros ajustados
-                    params = {
-                        'tab_id': 'home_tab',
-                        'refinement_paths[]': '/homes',
-                        'channel': 'EXPLORE',
-                        'query': 'Bogotá, Bogotá, D.C.',
-                        'place_id': 'ChIJKcumLf2bP44RFDmjIFVjnSM',
-                        'source': 'structured_search_input_header',
-                        'search_type': 'user_map_move',
-                        'search_mode': 'regular_search',
-                        'ne_lat': ne_lat,
-                        'ne_lng': ne_lng,
-                        'sw_lat': sw_lat,
-                        'sw_lng': sw_lng,
-                        'zoom': zoom_level,  # Mantiene el nivel de zoom
-                        'zoom_level': zoom_level,
-                        'search_by_map': 'true'
-                    }
-
-                    # Codifica los parámetros
-                    encoded_params = urllib.parse.urlencode(params, doseq=True, safe=',')
-                    base_url = "https://www.airbnb.com.co/s/Bogotá--Bogotá--D.C.--Colombia/homes?"
-                    url = base_url + encoded_params
-
-                    # Añade la URL generada a la lista junto con el área en metros cuadrados
-                    urls.append({
-                        'zoom_level': zoom_level,
-                        'sw_lat': sw_lat,
-                        'sw_lng': sw_lng,
-                        'ne_lat': ne_lat,
-                        'ne_lng': ne_lng,
-                        'tile_area_m2': area_m2,  # Tamaño del área del tile en metros cuadrados
-                        'url': url
-                    })
-
-                    # Actualiza la barra de progreso
-                    pbar.update(1)
-
-                    # Calcular ETA (Tiempo Estimado de Finalización)
-                    elapsed_time = time.time() - start_time
-                    tiles_completed = i * lng_steps + j + 1
-                    if tiles_completed > 0:
-                        eta = elapsed_time / tiles_completed * (total_tiles - tiles_completed)
-                        pbar.set_postfix(ETA=f'{eta:.2f}s')
+        url_template = build_url_template(zoom_level)
+        for chunk in iter_tile_chunks(south_lat, north_lat, west_lng, east_lng,
+                                      tile_size_lat, tile_size_lng, zoom_level):
+            for a, b, c, d, e in zip(chunk['sw_lat'].tolist(), chunk['sw_lng'].tolist(),
+                                     chunk['ne_lat'].tolist(), chunk['ne_lng'].tolist(),
+                                     chunk['tile_area_m2'].tolist()):
+                urls.append({
+                    'zoom_level': zoom_level,
+                    'sw_lat': a,
+                    'sw_lng': b,
+                    'ne_lat': c,
+                    'ne_lng': d,
+                    'tile_area_m2': e,  # Tamaño del área del tile en metros cuadrados
+                    'url': url_template.format(c, d, a, b)
+                })
 
         # Almacena las URLs por nivel de zoom
         all_urls_by_zoom[zoom_level] = urls
@@ -127,24 +205,26 @@ tile_size_longitude = 0.0002  # Aproximadamente 550 metros de longitud
 # Define los niveles de zoom que quieres probar
 zoom_levels = [14, 16, 18, 20, 22]  # Niveles de zoom a probar
 
-# Genera las URLs
-urls_by_zoom = generate_airbnb_urls(
-    south_latitude, north_latitude, west_longitude, east_longitude,
-    tile_size_latitude, tile_size_longitude,
-    zoom_levels
-)
-
-# Escribir las URLs en archivos JSON separados por nivel de zoom
-for zoom_level, urls in urls_by_zoom.items():
-    # Nombre del archivo JSON con el nivel de zoom
-    json_file = f'/home/jjleo/Entorno/Python/airbnb_scraper/airbnb_urls_bogota_zoom_{zoom_level}.json'
-    
-    # Guardar cada entrada de URL como una línea JSON
-    with open(json_file, 'w', encoding='utf-8') as f:
-        for entry in urls:
-            # Guardar cada entrada de URL correctamente formateada
-            json.dump(entry, f, ensure_ascii=False)
-            f.write('\n')  # Escribir cada URL en una línea separada
-    
-    # Mensaje de confirmación por cada archivo creado
-    print(f"{len(urls)} URLs for zoom level {zoom_level} have been saved to '{json_file}'.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de tiles de Airbnb para Bogotá")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="Escribe también el formato JSONL original además del binario .tiles")
+    args = parser.parse_args()
+
+    # Clear the console (adjusted for both Unix and Windows systems)
+    os.system("cls" if os.name == 'nt' else 'clear')
+
+    # Escribir los tiles en archivos separados por nivel de zoom, por bloques
+    for zoom_level in zoom_levels:
+        # Nombre base del archivo con el nivel de zoom
+        base_file = f'/home/jjleo/Entorno/Python/airbnb_scraper/airbnb_urls_bogota_zoom_{zoom_level}'
+        bounds = (south_latitude, north_latitude, west_longitude, east_longitude,
+                  tile_size_latitude, tile_size_longitude, zoom_level)
+
+        written = write_binary_tile_file(base_file + '.tiles', *bounds)
+        print(f"{written} tiles for zoom level {zoom_level} have been saved to '{base_file}.tiles'.")
+
+        if args.jsonl:
+            written = write_tile_file(base_file + '.json', *bounds)
+            # Mensaje de confirmación por cada archivo creado
+            print(f"{written} URLs for zoom level {zoom_level} have been saved to '{base_file}.json'.")
@@ -0,0 +1,124 @@
+import math
+import threading
+
+# Tamaño de la celda del índice, en grados (~275 m en Bogotá)
+INDEX_CELL_DEG = 0.0025
+
+# Metros por grado de latitud (el mismo valor que usa generador_urls)
+METERS_PER_DEGREE = 111320
+
+
+# Índice espacial en grilla sobre las coordenadas del maestro: cada celda
+# guarda id -> (lat, lng) de las publicaciones que caen en ella
+class SpatialIndex:
+    def __init__(self, cell_deg=INDEX_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, listing_id):
+        return listing_id in self.positions
+
+    def _cell(self, lat, lng):
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def insert(self, listing_id, lat, lng):
+        # Se descartan coordenadas faltantes (None, NaN o 0,0 por fallo de extracción)
+        if listing_id is None or lat is None or lng is None or lat != lat or lng != lng \
+                or (lat == 0 and lng == 0):
+            return False
+        lat, lng = float(lat), float(lng)
+        cell = self._cell(lat, lng)
+        with self.lock:
+            previous = self.positions.get(listing_id)
+            if previous is not None:
+                previous_cell = self._cell(*previous)
+                if previous_cell != cell:
+                    bucket = self.cells[previous_cell]
+                    del bucket[listing_id]
+                    if not bucket:
+                        del self.cells[previous_cell]
+            self.positions[listing_id] = (lat, lng)
+            self.cells.setdefault(cell, {})[listing_id] = (lat, lng)
+        return True
+
+    def insert_many(self, locations):
+        """
+        - locations: tuplas (id, lat, lng).
+        """
+        inserted = 0
+        for listing_id, lat, lng in locations:
+            inserted += self.insert(listing_id, lat, lng)
+        return inserted
+
+    def _scan_bbox(self, sw_lat, sw_lng, ne_lat, ne_lng):
+        """
+        Recorre las celdas que tocan el bbox. Retorna (celda completa, publicaciones):
+        las celdas interiores se entregan sin revisar punto a punto.
+        """
+        first_row, first_col = self._cell(sw_lat, sw_lng)
+        last_row, last_col = self._cell(ne_lat, ne_lng)
+        for row in range(first_row, last_row + 1):
+            inner_row = first_row < row < last_row
+            for col in range(first_col, last_col + 1):
+                bucket = self.cells.get((row, col))
+                if bucket:
+                    yield inner_row and first_col < col < last_col, bucket
+
+    def query_bbox(self, sw_lat, sw_lng, ne_lat, ne_lng):
+        """
+        Ids de las publicaciones dentro del bbox (bordes incluidos)
+        """
+        found = []
+        with self.lock:
+            for inner, bucket in self._scan_bbox(sw_lat, sw_lng, ne_lat, ne_lng):
+                if inner:
+                    found.extend(bucket)
+                    continue
+                found.extend(listing_id for listing_id, (lat, lng) in bucket.items()
+                             if sw_lat <= lat <= ne_lat and sw_lng <= lng <= ne_lng)
+        return found
+
+    def count_bbox(self, sw_lat, sw_lng, ne_lat, ne_lng):
+        count = 0
+        with self.lock:
+            for inner, bucket in self._scan_bbox(sw_lat, sw_lng, ne_lat, ne_lng):
+                if inner:
+                    count += len(bucket)
+                    continue
+                count += sum(1 for lat, lng in bucket.values()
+                             if sw_lat <= lat <= ne_lat and sw_lng <= lng <= ne_lng)
+        return count
+
+    def query_radius(self, lat, lng, radius_m):
+        """
+        Retorna (id, distancia en metros) de las publicaciones a menos de
+        radius_m del punto, ordenadas por distancia. Usa la aproximación
+        equirectangular, suficiente a escala de ciudad.
+        """
+        meters_per_lng = METERS_PER_DEGREE * math.cos(math.radians(lat))
+        delta_lat = radius_m / METERS_PER_DEGREE
+        delta_lng = radius_m / meters_per_lng
+        found = []
+        with self.lock:
+            for _, bucket in self._scan_bbox(lat - delta_lat, lng - delta_lng,
+                                             lat + delta_lat, lng + delta_lng):
+                for listing_id, (other_lat, other_lng) in bucket.items():
+                    distance = math.hypot((other_lat - lat) * METERS_PER_DEGREE,
+                                          (other_lng - lng) * meters_per_lng)
+                    if distance <= radius_m:
+                        found.append((listing_id, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    # El índice observa al escritor del maestro para agregar cada tarjeta nueva
+    def on_result(self, tile, cards_data):
+        for card in cards_data:
+            self.insert(card.get("id"), card.get("latitude"), card.get("longitude"))
+
+    def on_failure(self, tile, error=None):
+        pass
@@ -0,0 +1,259 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import psutil
+
+# Estados de un tile en el ledger
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+# Tiempo que un worker puede tener un tile antes de que otro lo reclame
+LEASE_SECONDS = 300
+
+# Intentos (reservas) a partir de los cuales --retry-failed deja de reintentar un tile
+MAX_RETRY_ATTEMPTS = 5
+
+
+# Versión del esquema del ledger (PRAGMA user_version); cada migración de datos corre una sola vez
+LEDGER_SCHEMA_VERSION = 1
+
+
+# Antigüedad a partir de la cual un tile terminado se vuelve a visitar en modo
+# incremental (los precios de las tarjetas cambian a diario)
+TILE_REFRESH_SECONDS = 24 * 3600
+
+
+# Identificador compacto de un tile: zoom y esquina suroeste redondeada
+def tile_id(zoom_level, sw_lat, sw_lng):
+    return f"{int(zoom_level)}:{sw_lat:.6f}:{sw_lng:.6f}"
+
+
+# Ledger de tiles: estado, intentos, tiempos y rendimiento de cada tile
+class TileLedger:
+    def __init__(self, filepath, lease_seconds=LEASE_SECONDS):
+        self.filepath = filepath
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.uname().nodename}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                tile_id TEXT PRIMARY KEY,
+                zoom_level INTEGER NOT NULL,
+                sw_lat REAL NOT NULL,
+                sw_lng REAL NOT NULL,
+                ne_lat REAL NOT NULL,
+                ne_lng REAL NOT NULL,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                listing_yield INTEGER,
+                result_total INTEGER,
+                last_error TEXT
+            )
+        """)
+        # Ledgers creados antes de guardar el total de resultados
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tiles)")}
+        if "result_total" not in columns:
+            self.conn.execute("ALTER TABLE tiles ADD COLUMN result_total INTEGER")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_status ON tiles (status)")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Antes, un tile que agotaba la espera quedaba terminado con 0 listados y sin
+            # total: no es un resultado confirmado, así que vuelve como fallido y sin rendimiento.
+            # Solo una vez: hoy un tile terminado puede tener 0 tarjetas y el total sin leer
+            cursor = self.conn.execute(
+                "UPDATE tiles SET status = ?, listing_yield = NULL, last_error = ? "
+                "WHERE status = ? AND listing_yield = 0 AND result_total IS NULL",
+                (FAILED, "Resultado sin confirmar (timeout)", DONE),
+            )
+            if cursor.rowcount:
+                logging.info(f"Ledger: {cursor.rowcount} tiles sin resultado confirmado pasan a fallidos.")
+        self.conn.execute(f"PRAGMA user_version = {LEDGER_SCHEMA_VERSION}")
+        # Posición de reanudación por archivo de tiles
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cursors (
+                source TEXT PRIMARY KEY,
+                position INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def _tile_row(self, tile, now):
+        return (tile["tile_id"], tile["zoom_level"], tile["sw_lat"], tile["sw_lng"],
+                tile["ne_lat"], tile["ne_lng"], tile["url"], now)
+
+    def done_ids(self):
+        """
+        Conjunto de tiles terminados, para reanudar con búsquedas O(1)
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT tile_id FROM tiles WHERE status = ?", (DONE,)).fetchall()
+        return {row[0] for row in rows}
+
+    def tile_info(self, tile_id_):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, attempts, listing_yield, result_total FROM tiles WHERE tile_id = ?",
+                (tile_id_,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("status", "attempts", "listing_yield", "result_total"), row))
+
+    def yield_map(self):
+        """
+        tile_id -> (listing_yield, result_total) de los tiles con rendimiento registrado
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT tile_id, listing_yield, result_total FROM tiles WHERE listing_yield IS NOT NULL"
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def lease(self, tile):
+        """
+        Reserva un tile para este proceso. Retorna False si ya está terminado
+        o si otro worker tiene una reserva vigente.
+        """
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO tiles (tile_id, zoom_level, sw_lat, sw_lng, ne_lat, ne_lng, url, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._tile_row(tile, now),
+                )
+                cursor = self.conn.execute(
+                    "UPDATE tiles SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, started_at = ? "
+                    "WHERE tile_id = ? AND (status IN (?, ?) OR (status = ? AND lease_expires < ?))",
+                    (IN_PROGRESS, self.owner, now + self.lease_seconds, now,
+                     tile["tile_id"], PENDING, FAILED, IN_PROGRESS, now),
+                )
+        return cursor.rowcount == 1
+
+    def mark_done(self, tile, listing_yield, result_total=None):
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE tiles SET status = ?, finished_at = ?, listing_yield = ?, result_total = ?, "
+                    "lease_owner = NULL, lease_expires = NULL, last_error = NULL WHERE tile_id = ?",
+                    (DONE, time.time(), listing_yield, result_total, tile["tile_id"]),
+                )
+
+    def mark_failed(self, tile, error=None):
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE tiles SET status = ?, finished_at = ?, lease_owner = NULL, "
+                    "lease_expires = NULL, last_error = ? WHERE tile_id = ?",
+                    (FAILED, time.time(), str(error) if error else None, tile["tile_id"]),
+                )
+
+    def mark_done_bulk(self, tiles):
+        """
+        Marca tiles como terminados sin visitarlos (migración del checkpoint antiguo)
+        """
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO tiles (tile_id, zoom_level, sw_lat, sw_lng, ne_lat, ne_lng, url, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._tile_row(tile, now) for tile in tiles],
+                )
+                self.conn.executemany(
+                    "UPDATE tiles SET status = ?, finished_at = ? WHERE tile_id = ?",
+                    [(DONE, now, tile["tile_id"]) for tile in tiles],
+                )
+
+    def iter_failed(self, max_attempts=None):
+        """
+        Tiles fallidos (opcionalmente con menos de max_attempts intentos), para reintentarlos
+        """
+        query = "SELECT tile_id, zoom_level, sw_lat, sw_lng, ne_lat, ne_lng, url FROM tiles WHERE status = ?"
+        params = [FAILED]
+        if max_attempts is not None:
+            query += " AND attempts < ?"
+            params.append(max_attempts)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY zoom_level, tile_id", params).fetchall()
+        for row in rows:
+            yield dict(zip(("tile_id", "zoom_level", "sw_lat", "sw_lng", "ne_lat", "ne_lng", "url"), row))
+
+    def reset_stale(self, max_age=TILE_REFRESH_SECONDS):
+        """
+        Devuelve a pendiente los tiles terminados hace más de max_age segundos.
+        Conserva el rendimiento anterior (lo usa el planificador) y reinicia los
+        cursores, que ya no marcan un prefijo de tiles terminados.
+        """
+        with self.lock:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "UPDATE tiles SET status = ?, attempts = 0 WHERE status = ? AND finished_at < ?",
+                    (PENDING, DONE, time.time() - max_age),
+                )
+                if cursor.rowcount:
+                    self.conn.execute("DELETE FROM cursors")
+        if cursor.rowcount:
+            logging.info(f"Ledger: {cursor.rowcount} tiles vencidos vuelven a pendiente.")
+        return cursor.rowcount
+
+    def release_dead_owners(self):
+        """
+        Libera las reservas de procesos de esta máquina que ya no existen
+        (por ejemplo, una ejecución anterior que se cayó)
+        """
+        host = os.uname().nodename
+        with self.lock:
+            owners = self.conn.execute(
+                "SELECT DISTINCT lease_owner FROM tiles WHERE status = ? AND lease_owner LIKE ?",
+                (IN_PROGRESS, f"{host}:%"),
+            ).fetchall()
+            dead = [owner for (owner,) in owners if not psutil.pid_exists(int(owner.rsplit(":", 1)[1]))]
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE tiles SET status = ?, lease_owner = NULL, lease_expires = NULL "
+                    "WHERE status = ? AND lease_owner = ?",
+                    [(PENDING, IN_PROGRESS, owner) for owner in dead],
+                )
+        return len(dead)
+
+    def get_cursor(self, source):
+        with self.lock:
+            row = self.conn.execute("SELECT position FROM cursors WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else 0
+
+    def set_cursor(self, source, position):
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO cursors (source, position) VALUES (?, ?) "
+                    "ON CONFLICT(source) DO UPDATE SET position = excluded.position",
+                    (source, position),
+                )
+
+    def summary(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM tiles GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
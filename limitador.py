@@ -0,0 +1,221 @@
+import time
+import random
+import logging
+import threading
+import urllib.parse
+
+import requests
+
+from metricas import METRICS
+
+# Ritmo inicial, mínimo y máximo por host, en peticiones por segundo
+INITIAL_RATE = 2.0
+MIN_RATE = 0.2
+MAX_RATE = 20.0
+
+# Aumento aditivo del ritmo por cada petición exitosa (y reducción a la mitad al ser frenados)
+RATE_INCREASE = 0.05
+RATE_DECREASE_FACTOR = 0.5
+
+# Segundos de ritmo que se pueden acumular como ráfaga
+BURST_SECONDS = 1.0
+
+# Fallos seguidos que abren el circuito, y pausa inicial y máxima del host
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+
+# Códigos con los que el servidor indica que vamos demasiado rápido
+THROTTLE_STATUS = {403, 429}
+
+# Reintentos por petición y espera base/máxima entre ellos (exponencial con jitter)
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+# Estados del circuito
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# Error de una respuesta que indica freno o falla del servidor
+class ThrottledError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f"HTTP {status} en {url}")
+        self.status = status
+
+
+# Cubeta de tokens de un host con ritmo AIMD y cortacircuitos
+class HostLimiter:
+    def __init__(self, host, rate=INITIAL_RATE, max_rate=MAX_RATE):
+        self.host = host
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.probe_in_flight = False
+
+    def _refill(self, now):
+        capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """
+        Toma un token si hay. Retorna 0 si se puede enviar la petición, o los
+        segundos que conviene esperar antes de volver a intentar.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return self.open_until - now
+                # Pasada la pausa, una sola petición de prueba decide si se cierra
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN and self.probe_in_flight:
+                return 0.5
+            self._refill(now)
+            if self.tokens < 1.0:
+                return (1.0 - self.tokens) / self.rate
+            self.tokens -= 1.0
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = True
+            return 0.0
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+            if self.state == HALF_OPEN:
+                logging.info(f"Limitador: {self.host} responde de nuevo; circuito cerrado.")
+                self.state = CLOSED
+                self.cooldown = BREAKER_COOLDOWN
+                self.probe_in_flight = False
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(MIN_RATE, self.rate * RATE_DECREASE_FACTOR)
+            self.tokens = min(self.tokens, 0.0)
+            self._failure()
+
+    def failed(self):
+        with self.lock:
+            self._failure()
+
+    def _failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= BREAKER_THRESHOLD:
+            self.state = OPEN
+            self.open_until = time.monotonic() + self.cooldown
+            logging.warning(f"Limitador: {self.failures} fallos seguidos en {self.host}; "
+                            f"pausa de {self.cooldown:.0f} s (ritmo {self.rate:.2f}/s).")
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+            self.failures = 0
+
+
+# Limitador compartido: una cubeta por host para todos los hilos y etapas
+class RateLimiter:
+    def __init__(self, initial_rate=INITIAL_RATE, max_rate=MAX_RATE):
+        """
+        - max_rate: techo del ritmo por host (los benchmarks contra servidor_local.py lo suben).
+        """
+        self.initial_rate = initial_rate
+        self.max_rate = max_rate
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def host(self, url):
+        name = urllib.parse.urlsplit(url).netloc.lower()
+        with self.lock:
+            if name not in self.hosts:
+                self.hosts[name] = HostLimiter(name, self.initial_rate, self.max_rate)
+            return self.hosts[name]
+
+    def acquire(self, url):
+        # Bloquea hasta que el host tenga un token y el circuito permita enviar
+        limiter = self.host(url)
+        while True:
+            wait = limiter.reserve()
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def success(self, url):
+        self.host(url).success()
+
+    def throttled(self, url):
+        self.host(url).throttled()
+
+    def failed(self, url):
+        self.host(url).failed()
+
+    def report_status(self, url, status):
+        if status in THROTTLE_STATUS:
+            self.throttled(url)
+        elif status >= 500:
+            self.failed(url)
+        else:
+            self.success(url)
+
+    def summary(self):
+        with self.lock:
+            hosts = list(self.hosts.values())
+        return {limiter.host: f"{limiter.rate:.2f}/s ({limiter.state})" for limiter in hosts}
+
+
+# Limitador por defecto de todos los fetchers del proceso
+SHARED_LIMITER = RateLimiter()
+
+
+# Función que hace un GET respetando el limitador y le informa el resultado.
+# Lanza ThrottledError si el servidor frena (403/429) o falla (5xx).
+def limited_get(session, url, limiter=SHARED_LIMITER, **kwargs):
+    # Las respuestas servidas desde la caché (--replay) no cuentan para el ritmo
+    if getattr(session, "offline", False):
+        return session.get(url, **kwargs)
+    limiter.acquire(url)
+    try:
+        r = session.get(url, **kwargs)
+    except (requests.Timeout, requests.ConnectionError):
+        limiter.throttled(url)
+        raise
+    except Exception:
+        limiter.failed(url)
+        raise
+    limiter.report_status(url, r.status_code)
+    if r.status_code in THROTTLE_STATUS or r.status_code >= 500:
+        raise ThrottledError(url, r.status_code)
+    return r
+
+
+# Función que calcula la espera antes del reintento número attempt (desde 0)
+def backoff_delay(attempt):
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+# Errores transitorios que vale la pena reintentar
+RETRYABLE_ERRORS = (ThrottledError, requests.Timeout, requests.ConnectionError)
+
+
+# Función que reintenta func con espera exponencial ante errores transitorios;
+# relanza el último error (o cualquier otro de inmediato)
+def with_retries(func, attempts=RETRY_ATTEMPTS, description="petición", retry_on=RETRYABLE_ERRORS):
+    for attempt in range(attempts):
+        try:
+            return func()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            logging.warning(f"{description} falló (intento {attempt + 1}/{attempts}): {e}; "
+                            f"reintento en {delay:.1f} s")
+            METRICS.inc("retries")
+            time.sleep(delay)
@@ -1,88 +1,51 @@
 import os
 import json
-import time
-import random
 import logging
 import psutil
-import requests
 import re
 import signal
-import pandas as pd
+import argparse
+import urllib.parse
+from collections import deque
 from tqdm import tqdm
 from bs4 import BeautifulSoup
 
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import (
-    NoSuchElementException,
-    WebDriverException,
-    StaleElementReferenceException,
-)
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException, TimeoutException
 from selenium.webdriver.firefox.options import Options
 
-# Configuración de Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("scraper.log"),
-        logging.StreamHandler()
-    ]
-)
-
-# Clase AirbnbScraper con el método extract_lat_lon
-class AirbnbScraper:
-    def extract_lat_lon(self, idPublication):
-        attempts = 0
-        success = False
-
-        while not success and attempts < 10:
-            try:
-                URL = 'https://www.airbnb.com.co/rooms/'
-                r = requests.get(URL + str(idPublication))
-                p_lat = re.compile(r'"lat":([-0-9.]+),')
-                p_lon = re.compile(r'"lng":([-0-9.]+),')
-                lat_matches = p_lat.findall(r.text)
-                lon_matches = p_lon.findall(r.text)
-                if lat_matches and lon_matches:
-                    lat = lat_matches[0]
-                    lon = lon_matches[0]
-                    success = True
-                    return float(lat), float(lon)
-                else:
-                    raise ValueError("No se encontraron coordenadas.")
-            except Exception as e:
-                logging.warning(f'No hay coordenada, intento número: {attempts + 1}')
-                logging.warning(f'Error: {e}')
-                attempts += 1
-                time.sleep(1)  # Esperar un segundo antes de reintentar
-        return 0.0, 0.0
-
-def extract_last_comment_date(idPublication: str) -> str:
-    try:
-        URL = f'https://www.airbnb.com.co/rooms/{idPublication}/reviews'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-        }
-        r = requests.get(URL, headers=headers)
-        soup = BeautifulSoup(r.text, 'html.parser')
-
-        dates_comments = soup.find_all('div', class_='s78n3tv')
-
-        if dates_comments:
-            last_comment = dates_comments[-1].get_text(strip=True)
-            print(f"Último comentario encontrado: {last_comment}")
-            return last_comment
-        else:
-            print(f"No se encontraron comentarios para la publicación {idPublication}")
-            return ""
-
-    except Exception as e:
-        print(f"Error al extraer la fecha del último comentario para la publicación {idPublication}: {e}")
-        return ""
+from enriquecimiento import AIRBNB_BASE_URL, AirbnbScraper
+from resenas import ReviewFetcher
+from cache_listados import ListingCache
+from pool_navegadores import BrowserWorkerPool
+from ciclo_drivers import DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB, STANDBY_LEAD, DriverManager
+from almacenamiento import JsonMasterStore, ListingLog, SQLiteMasterStore
+from ledger_tiles import MAX_RETRY_ATTEMPTS, TILE_REFRESH_SECONDS, TileLedger, tile_id
+from tiles import count_tiles, iter_tile_records, resolve_tile_file, ResumeCursor, TileFileReader
+from rastreo_adaptativo import MAX_ZOOM, SEARCH_RESULT_CAP, QuadtreeCrawl, root_tiles
+from generador_urls import (south_latitude, north_latitude, west_longitude, east_longitude,
+                            tile_size_latitude, tile_size_longitude)
+from planificador import DEFAULT_PROBE_RATE, YieldScheduler
+from indice_espacial import SpatialIndex
+from paginacion import PAGE_LINKS_SCRIPT, RESULTS_PER_PAGE, PaginationCrawl
+from frontera import VisitedUrls
+from limitador import SHARED_LIMITER
+from cache_respuestas import SEARCH_PAGE, CachingSession, ResponseCache
+from metricas import EXPORT_INTERVAL, METRICS, MetricsExporter
+from perfilado import PROFILE_EVERY_PAGES, profiler_from_options
+from selectores import CARD_CLASSES
+from esperas import PAGE_LOAD_STRATEGY, LatencyHistogram, ResultsTimeoutError, wait_for_results
+
+# Configuración de Logging (solo al ejecutar el scraper: importar main no crea scraper.log)
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("scraper.log"),
+            logging.StreamHandler()
+        ]
+    )
 
 # Función para monitorear y loguear el uso de memoria
 def log_memory_usage():
@@ -90,9 +53,8 @@ def log_memory_usage():
     mem = process.memory_info().rss / (1024 ** 2)  # Convertir a MB
     logging.info(f"Uso de memoria: {mem:.2f} MB")
 
-# Función para esperar un tiempo específico
-def wait_for_page_load(seconds):
-    time.sleep(seconds)
+# Latencias observadas hasta que cada tile está listo (compartido por todos los workers)
+page_latency = LatencyHistogram()
 
 # Función que clasifica si es habitación o apartamento
 def roomOrHouse(TypeDescription: str) -> str:
@@ -104,118 +66,169 @@ def roomOrHouse(TypeDescription: str) -> str:
     else:
         return "house"
 
+# Número máximo de tarjetas que se procesan por página
+MAX_CARDS_PER_PAGE = 100
+
+# Script que extrae todas las tarjetas de la página en una sola llamada al driver
+CARD_EXTRACTION_SCRIPT = """
+const classes = arguments[1];
+const first = (card, cls) => card.getElementsByClassName(cls)[0] || null;
+const cards = Array.from(document.getElementsByClassName(classes.card)).slice(0, arguments[0]);
+return cards.map(card => {
+    const link = first(card, classes.link);
+    const location = first(card, classes.location);
+    const description = first(card, classes.description);
+    const image = first(card, classes.image);
+    const price = first(card, classes.price);
+    const rating = first(card, classes.rating);
+    return {
+        link: link ? link.href : null,
+        location: location ? location.innerText : null,
+        description: description ? description.innerText : null,
+        image: image ? image.src : null,
+        price: price ? price.innerText : null,
+        rating: rating ? rating.innerText : null,
+    };
+});
+"""
+
+# Función que extrae las tarjetas del HTML de una página guardada, igual que
+# CARD_EXTRACTION_SCRIPT pero sin navegador
+def parse_search_page(html, max_cards=MAX_CARDS_PER_PAGE):
+    soup = BeautifulSoup(html, "html.parser")
+    raw_cards = []
+    for card in soup.find_all(class_=CARD_CLASSES["card"], limit=max_cards):
+        def first(field):
+            return card.find(class_=CARD_CLASSES[field])
+
+        link = first("link")
+        image = first("image")
+        raw = {
+            "link": urllib.parse.urljoin(AIRBNB_BASE_URL, link.get("href")) if link and link.get("href") else None,
+            "image": image.get("src") if image else None,
+        }
+        for field in ("location", "description", "price", "rating"):
+            element = first(field)
+            raw[field] = element.get_text(" ", strip=True) if element else None
+        raw_cards.append(raw)
+    return raw_cards
+
+# Script que lee el total de resultados anunciado en la página ("Más de 1.000 alojamientos")
+RESULT_TOTAL_SCRIPT = """
+const pattern = /(m[aá]s de\\s+)?(\\d[\\d.,]*)\\s+(alojamientos|stays|homes)/i;
+for (const el of document.querySelectorAll('h1, h2, span')) {
+    const match = el.innerText && el.innerText.match(pattern);
+    if (match) {
+        return [parseInt(match[2].replace(/[.,]/g, ''), 10), Boolean(match[1])];
+    }
+}
+return null;
+"""
+
+# Función que obtiene el total de resultados del tile (None si no aparece)
+def extract_result_total(driver):
+    try:
+        result = driver.execute_script(RESULT_TOTAL_SCRIPT)
+    except WebDriverException:
+        return None
+    if not result:
+        return None
+    total, lower_bound = result
+    # "Más de N" significa que hay al menos N + 1
+    return total + 1 if lower_bound else total
+
+# Función que convierte una tarjeta extraída del DOM en un registro del maestro
+def build_card_record(raw, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level):
+    link_component = raw.get("link") or "No link"
+    if link_component != "No link":
+        listing_id = link_component.split("/")[-1].split("?")[0]  # Extract ID from URL
+    else:
+        listing_id = "unknown"
+    description = raw.get("description") or "No description"
+
+    return {
+        "id": listing_id,
+        "link": link_component,
+        "location": raw.get("location") or "No location",
+        "description": description,
+        "image": raw.get("image") or "No image",
+        "price": raw.get("price") or "No price",
+        "rating": raw.get("rating") or "No rating",
+        "latitude": 0.0,  # Filled from the room page
+        "longitude": 0.0,
+        "last_comment_date": None,
+        "sw_lat": sw_lat,
+        "sw_lng": sw_lng,
+        "ne_lat": ne_lat,
+        "ne_lng": ne_lng,
+        "zoom_level": zoom_level,
+        "TypeRoomOrHouse": roomOrHouse(description) if description else "unknown"
+    }
+
 # Función para extraer datos de las tarjetas en la página actual
-def extract_listings(driver, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level):
+def extract_listings(driver, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level, scraper=None, review_fetcher=None,
+                     response_cache=None):
+    # Los errores se propagan: el tile queda fallido en el ledger (y se reintenta)
+    # en vez de darse por terminado sin tarjetas. process_tile ya confirmó las
+    # tarjetas con wait_for_results, así que no se vuelve a esperar
+
+    # Guardar el HTML de la página para volver a extraerla sin red (--replay)
+    if response_cache is not None:
+        response_cache.put(driver.current_url, driver.page_source, SEARCH_PAGE, meta={
+            "sw_lat": sw_lat, "sw_lng": sw_lng, "ne_lat": ne_lat, "ne_lng": ne_lng,
+            "zoom_level": zoom_level,
+        })
+
+    # Read every card in one round trip instead of ~12 per card
+    with METRICS.timer("extract_listings"):
+        raw_cards = driver.execute_script(CARD_EXTRACTION_SCRIPT, MAX_CARDS_PER_PAGE, CARD_CLASSES) or []
+    logging.info(f"Encontrados {len(raw_cards)} elementos para procesar.")
+
+    return build_cards(raw_cards, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level, scraper, review_fetcher)
+
+# Función que convierte las tarjetas crudas de una página en registros enriquecidos.
+# Con skip_missing (--replay) se omiten las tarjetas sin página de publicación o sin
+# reseñas en la caché de respuestas, para no pisar en el maestro datos buenos con vacíos
+def build_cards(raw_cards, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level, scraper=None, review_fetcher=None,
+                skip_missing=False):
     cards_data = []
-    try:
-        # Wait for the cards to be present
-        wait = WebDriverWait(driver, 10)
-        cards = wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, "cy5jw6o")))
-        cards = cards[:100]  # Limit to first 100 elements
-        logging.info(f"Encontrados {len(cards)} elementos para procesar.")
 
-        # Instantiate the AirbnbScraper class
+    # Instantiate the AirbnbScraper class (reuse the pooled session if given)
+    if scraper is None:
         scraper = AirbnbScraper()
 
-        for index, card in enumerate(cards):
-            try:
-                # Extract data from the card
-                try:
-                    link_component = card.find_element(By.CLASS_NAME, "bn2bl2p").get_attribute("href")
-                    listing_id = link_component.split("/")[-1].split("?")[0]  # Extract ID from URL
-                except NoSuchElementException:
-                    link_component = "No link"
-                    listing_id = "unknown"
-
-                try:
-                    location = card.find_element(By.CLASS_NAME, "t1jojoys").text
-                except NoSuchElementException:
-                    location = "No location"
-
-                try:
-                    description = card.find_element(By.CLASS_NAME, "s1cjsi4j").text
-                except NoSuchElementException:
-                    description = "No description"
-
-                try:
-                    image = card.find_element(By.CLASS_NAME, "itu7ddv").get_attribute("src")
-                except NoSuchElementException:
-                    image = "No image"
-
-                try:
-                    price = card.find_element(By.CLASS_NAME, "_11jcbg2").text
-                except NoSuchElementException:
-                    price = "No price"
-
-                try:
-                    rating = card.find_element(By.CLASS_NAME, "r4a59j5").text
-                except NoSuchElementException:
-                    rating = "No rating"
+    for index, raw in enumerate(raw_cards):
+        try:
+            cards_data.append(build_card_record(raw, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level))
+        except Exception as e:
+            logging.error(f"Error processing card at index {index}: {e}")
+            continue
 
-                # Get coordinates using the extract_lat_lon method
-                try:
-                    lat, lon = scraper.extract_lat_lon(listing_id)
-                except Exception:
-                    lat, lon = 0.0, 0.0
-
-                # Do not extract last_comment_date here
-                last_comment = None
-
-                # Add data to the list
-                data = {
-                    "id": listing_id,
-                    "link": link_component,
-                    "location": location,
-                    "description": description,
-                    "image": image,
-                    "price": price,
-                    "rating": rating,
-                    "latitude": lat,
-                    "longitude": lon,
-                    "last_comment_date": last_comment,  # Will extract later
-                    "sw_lat": sw_lat,
-                    "sw_lng": sw_lng,
-                    "ne_lat": ne_lat,
-                    "ne_lng": ne_lng,
-                    "zoom_level": zoom_level,
-                    "TypeRoomOrHouse": roomOrHouse(description) if description else "unknown"
-                }
-                cards_data.append(data)
-
-            except StaleElementReferenceException:
-                logging.warning(f"StaleElementReferenceException encountered at index {index}. Skipping this card.")
-                continue
-            except Exception as e:
-                logging.error(f"Error processing card at index {index}: {e}")
-                continue
-
-    except Exception as e:
-        logging.error(f"Error al extraer listados: {e}")
+    # Enrich the whole page at once: one /rooms/{id} fetch per listing
+    # fills coordinates, last review date, title and description
+    with METRICS.timer("enrich"):
+        rooms = scraper.enrich_listings([card["id"] for card in cards_data])
+    for card in cards_data:
+        if card["id"] in rooms:
+            card.update(rooms[card["id"]])
+    if skip_missing:
+        cards_data = [card for card in cards_data if card["id"] in rooms]
+
+    # Reseñas completas por HTTP (fecha, calificación e idioma de cada una)
+    if review_fetcher is not None:
+        with METRICS.timer("reviews"):
+            summaries = review_fetcher.fetch_many([card["id"] for card in cards_data])
+        for card in cards_data:
+            summary = summaries.get(card["id"])
+            if summary is not None:
+                card["reviews"] = summary["reviews"]
+                card["last_comment_date"] = summary["latest_review_date"] or card["last_comment_date"]
+                card["first_comment_date"] = summary["earliest_review_date"]
+        if skip_missing:
+            cards_data = [card for card in cards_data if card["id"] in summaries]
 
     return cards_data
 
-# Cargar datos JSON desde un archivo
-def load_json_data(filepath):
-    if os.path.exists(filepath):
-        with open(filepath, "r", encoding="utf-8") as json_file:
-            try:
-                data = json.load(json_file)
-                if not data:
-                    logging.info(f"El archivo {filepath} está vacío.")
-                    return {}
-                return data
-            except json.JSONDecodeError as e:
-                logging.error(f"Error al cargar JSON desde {filepath}: {e}")
-                return {}
-    else:
-        logging.info(f"El archivo {filepath} no existe.")
-        return {}
-
-# Guardar datos JSON en un archivo
-def save_json_data(filepath, data):
-    with open(filepath, "w", encoding="utf-8") as json_file:
-        json.dump(data, json_file, ensure_ascii=False, indent=4)
-
 # Funciones para el checkpoint
 def load_checkpoint(filepath):
     if os.path.exists(filepath):
@@ -243,149 +256,426 @@ def signal_handler(sig, frame):
     stop_requested = True
     logging.info("Interrupción del usuario detectada. Guardando estado y deteniendo el programa...")
 
-# Función para extraer enlaces siguientes y manejarlos eficientemente
-def extract_data_in_groups(driver, json_files):
-    global stop_requested
-
-    # Directorio del archivo maestro
-    master_filepath = "/home/jjleo/Entorno/Python/airbnb_scraper/airbnb_master_listings.json"
-    master_dir = os.path.dirname(master_filepath)
-
-    # Cargar datos existentes del master
-    master_data = load_json_data(master_filepath)
-    logging.info(f"El archivo maestro contiene actualmente {len(master_data)} listados.")
-
-    # Convertir master_data a DataFrame
-    if master_data:
-        master_df = pd.DataFrame.from_dict(master_data, orient='index')
-        master_df.reset_index(inplace=True)
-    else:
-        master_df = pd.DataFrame()
+# Función que convierte un registro de un archivo de tiles en un tile con su id compacto
+def build_tile(row, source=None, index=None):
+    tile = {
+        "url": row['url'],
+        "sw_lat": float(row['sw_lat']),
+        "sw_lng": float(row['sw_lng']),
+        "ne_lat": float(row['ne_lat']),
+        "ne_lng": float(row['ne_lng']),
+        "zoom_level": int(row['zoom_level']),
+        "source": source,
+        "index": index,
+    }
+    tile["tile_id"] = tile_id(tile["zoom_level"], tile["sw_lat"], tile["sw_lng"])
+    return tile
+
+# Función que migra el checkpoint antiguo (solo last_url) al ledger de tiles
+def migrate_checkpoint(json_files, ledger, checkpoint_filepath):
+    last_processed_url = load_checkpoint(checkpoint_filepath)
+    if not last_processed_url:
+        return
 
-    logging.info(f"El archivo maestro contiene actualmente {len(master_df)} listados.")
+    skipped = []
+    for json_file in json_files:
+        try:
+            for index, row in iter_tile_records(json_file):
+                skipped.append(build_tile(row))
+                if row['url'] == last_processed_url:
+                    ledger.mark_done_bulk(skipped)
+                    ledger.set_cursor(json_file, index + 1)
+                    logging.info(f"Checkpoint migrado al ledger: {len(skipped)} tiles marcados como terminados.")
+                    os.replace(checkpoint_filepath, checkpoint_filepath + ".migrated")
+                    return
+        except Exception as e:
+            logging.error(f"Error al cargar datos del archivo {json_file}: {e}")
+            continue
 
-    # Checkpoint mechanism
-    checkpoint_filepath = os.path.join(master_dir, "checkpoint.json")
-    last_processed_url = load_checkpoint(checkpoint_filepath)
-    checkpoint_found = last_processed_url == ""  # If no checkpoint URL, start processing immediately
+    logging.warning("La URL del checkpoint antiguo no aparece en los archivos de tiles; se ignora.")
+    os.replace(checkpoint_filepath, checkpoint_filepath + ".migrated")
 
-    # Procesar archivos JSON directamente
+# Función que recorre los archivos de tiles saltando los ya terminados.
+# Empieza en el cursor de cada archivo (búsqueda directa con el índice .idx)
+# y lee los registros uno a uno, sin cargar el archivo completo.
+def iter_pending_tiles(json_files, done_ids, cursor):
     for idx, json_file in enumerate(tqdm(json_files, desc="Procesando archivos JSON", unit="archivo")):
         logging.info(f"Procesando archivo JSON: {json_file}")
 
-        # Load the data from the JSON file into a DataFrame
         try:
-            with open(json_file, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-                data_list = [json.loads(line.strip()) for line in lines]
-                df_links = pd.DataFrame(data_list)
-        except Exception as e:
+            start = cursor.start(json_file)
+            if start:
+                logging.info(f"Reanudando {json_file} desde el tile {start}.")
+            records = iter_tile_records(json_file, start)
+            for index, row in records:
+                try:
+                    tile = build_tile(row, json_file, index)
+                except Exception as e:
+                    logging.error(f"Error al procesar la fila {index} del archivo {json_file}: {e}")
+                    continue
+                if tile["tile_id"] in done_ids:
+                    cursor.mark(json_file, index)
+                    continue
+                yield tile
+        except (OSError, ValueError) as e:
             logging.error(f"Error al cargar datos del archivo {json_file}: {e}")
             continue
 
-        if not checkpoint_found:
-            if last_processed_url in df_links['url'].values:
-                checkpoint_found = True
-                logging.info(f"Checkpoint URL found in file {json_file}. Resuming from there.")
-                # Filter the DataFrame to start from the checkpoint
-                idx_checkpoint = df_links.index[df_links['url'] == last_processed_url].tolist()[0]
-                df_links = df_links.iloc[idx_checkpoint+1:]
-            else:
-                logging.info(f"Checkpoint URL not found in file {json_file}. Skipping this file.")
-                continue  # Skip this file
-
-        # Process each URL in the DataFrame
-        for idx_row, row in df_links.iterrows():
-            if stop_requested:
-                break
-            try:
-                url_json = row['url']
-                sw_lat = row['sw_lat']
-                sw_lng = row['sw_lng']
-                ne_lat = row['ne_lat']
-                ne_lng = row['ne_lng']
-                zoom_level = row['zoom_level']
+# Función que reserva cada tile en el ledger antes de entregarlo a un worker
+def lease_tiles(ledger, tiles):
+    for tile in tiles:
+        if ledger.lease(tile):
+            yield tile
+
+# Función que visita un tile y extrae sus tarjetas
+def process_tile(driver, tile, scraper, review_fetcher=None, response_cache=None):
+    logging.info(f"Procesando link: {tile['url']} con coordenadas: "
+                 f"{tile['sw_lat']}, {tile['sw_lng']}, {tile['ne_lat']}, {tile['ne_lng']}")
+    # El navegador comparte el ritmo por host con las peticiones HTTP. Todo lo que
+    # sigue a acquire informa su resultado al limitador aunque lance: si esta carga
+    # era la petición de prueba del circuito, el host no puede quedar bloqueado
+    SHARED_LIMITER.acquire(tile['url'])
+    reported = False
+    try:
+        try:
+            with METRICS.timer("driver_get"):
+                driver.get(tile['url'])
+        except TimeoutException:
+            SHARED_LIMITER.throttled(tile['url'])
+            reported = True
+            raise
+
+        # Esperar a que haya tarjetas estables o el aviso de "sin resultados"
+        with METRICS.timer("wait_results"):
+            state, count = wait_for_results(driver, page_latency)
+        METRICS.inc("pages")
+        log_memory_usage()
+        if state == "timeout":
+            SHARED_LIMITER.throttled(tile['url'])
+        else:
+            SHARED_LIMITER.success(tile['url'])
+        reported = True
+    finally:
+        if not reported:
+            SHARED_LIMITER.failed(tile['url'])
+
+    if state == "timeout":
+        # El tile queda fallido en el ledger (y se reintenta) en vez de terminado con 0 listados
+        raise ResultsTimeoutError(f"Sin tarjetas ni aviso de \"sin resultados\" en {tile['url']}")
+    if state == "empty":
+        logging.info("Tile sin resultados.")
+        tile["result_total"] = 0
+        return []
+    tile["result_total"] = extract_result_total(driver)
+    if tile["result_total"] is None:
+        # Sin total anunciado, la paginación sigue los botones de página
+        try:
+            tile["page_links"] = driver.execute_script(PAGE_LINKS_SCRIPT) or []
+        except WebDriverException:
+            tile["page_links"] = []
 
-                logging.info(f"Procesando link: {url_json} con coordenadas: {sw_lat}, {sw_lng}, {ne_lat}, {ne_lng}")
+    # Extrae listados de la página actual
+    return extract_listings(driver, tile['sw_lat'], tile['sw_lng'], tile['ne_lat'], tile['ne_lng'],
+                            tile['zoom_level'], scraper, review_fetcher, response_cache)
 
-                # Verificar si el driver está activo
-                if driver.session_id is None:
-                    logging.warning("El driver ha perdido la sesión. Re-iniciando el driver...")
-                    driver.quit()
-                    driver = setup_webdriver()
+# Archivo maestro de publicaciones (su carpeta guarda el ledger, las cachés y el resto del estado)
+MASTER_FILEPATH = "/home/jjleo/Entorno/Python/airbnb_scraper/airbnb_master_listings.json"
 
-                try:
-                    driver.get(url_json)
-                    wait_for_page_load(3)
-                    log_memory_usage()
-
-                    # Extrae listados de la página actual
-                    cards_data = extract_listings(driver, sw_lat, sw_lng, ne_lat, ne_lng, zoom_level)
-
-                    if cards_data:
-                        logging.info(f"Se encontraron {len(cards_data)} nuevos listados.")
-
-                        # Extract last_comment_date for each listing
-                        for card_data in cards_data:
-                            listing_id = card_data['id']
-                            if listing_id != "unknown":
-                                try:
-                                    last_comment = extract_last_comment_date(listing_id)
-                                    card_data['last_comment_date'] = last_comment
-                                except Exception as e:
-                                    logging.error(f"Error extracting last_comment_date for listing {listing_id}: {e}")
-                                    card_data['last_comment_date'] = None
-
-                        # Convertir cards_data a DataFrame
-                        cards_df = pd.DataFrame(cards_data)
-
-                        # Merge with master_df
-                        if not master_df.empty:
-                            master_df = pd.concat([master_df, cards_df], ignore_index=True)
-                        else:
-                            master_df = cards_df
-
-                        # Eliminar duplicados basados en 'id'
-                        master_df.drop_duplicates(subset='id', keep='last', inplace=True)
-
-                        # Guardar el JSON maestro actualizado
-                        master_df.set_index('id', inplace=True)
-                        master_df.to_json(master_filepath, orient='index', indent=4, force_ascii=False)
-                        master_df.reset_index(inplace=True)  # Reset index for future concatenations
-                        logging.info(f"Datos extraídos y agregados al archivo maestro: {master_filepath}")
-                        logging.info(f"El archivo maestro contiene actualmente {len(master_df)} listados.")
-                    else:
-                        logging.info("No se encontraron nuevos listados en esta página.")
-
-                    # Save the checkpoint
-                    save_checkpoint(checkpoint_filepath, url_json)
-
-                except WebDriverException as e:
-                    logging.error(f"Error del WebDriver al procesar el enlace {url_json}: {e}")
-                    driver.quit()
-                    driver = setup_webdriver()
-                    continue
-                except Exception as e:
-                    logging.error(f"Error al procesar el enlace {url_json}: {e}")
-                    continue
+# Carpeta de la caché de respuestas (dentro de la carpeta del maestro)
+RESPONSE_CACHE_DIR = "response_cache"
 
-            except Exception as e:
-                logging.error(f"Error al procesar la fila {idx_row} del archivo {json_file}: {e}")
+# Modos de almacenamiento del maestro
+STORAGE_MODES = ("sqlite", "json", "log")
+
+# Segundos entre compactaciones del log en segundo plano
+LOG_COMPACT_INTERVAL = 600
+
+# Función que crea el almacén del maestro según el modo elegido
+def open_master_store(storage, master_filepath):
+    master_dir = os.path.dirname(master_filepath)
+    if storage == "sqlite":
+        return SQLiteMasterStore(os.path.join(master_dir, "airbnb_master_listings.sqlite"),
+                                 export_filepath=master_filepath)
+    if storage == "log":
+        return ListingLog(master_filepath, os.path.join(master_dir, "master_log"),
+                          compact_interval=LOG_COMPACT_INTERVAL)
+    return JsonMasterStore(master_filepath)
+
+# Clase que mantiene el archivo maestro y el ledger de tiles (único escritor)
+class MasterWriter:
+    def __init__(self, store, ledger, cursor):
+        self.store = store
+        self.ledger = ledger
+        self.cursor = cursor
+        # Objetos con on_result(tile, cards_data) / on_failure(tile, error) que
+        # reaccionan a cada tile terminado (por ejemplo, el rastreo adaptativo)
+        self.observers = []
+        # Tiles cuyas tarjetas aún no están en disco (el log agrupa los fsync):
+        # (página del log, tile, listados). El ledger y el cursor los dan por
+        # terminados solo tras el fsync que los cubre, así una caída no deja
+        # tiles terminados sin sus listados
+        self.unsynced = deque()
+
+    def add_cards(self, cards_data):
+        if cards_data:
+            logging.info(f"Se encontraron {len(cards_data)} nuevos listados.")
+            with METRICS.timer("master_write"):
+                written = self.store.add_cards(cards_data)
+            METRICS.inc("listings", len(cards_data))
+            METRICS.inc("bytes_written", written or 0)
+            logging.info(f"El archivo maestro contiene actualmente {len(self.store)} listados.")
+        else:
+            logging.info("No se encontraron nuevos listados en esta página.")
+
+    def mark_failed(self, tile, error=None):
+        self.ledger.mark_failed(tile, error)
+        METRICS.inc("tiles_failed")
+        for observer in self.observers:
+            observer.on_failure(tile, error)
+
+    def _mark_done(self, tile, listing_yield):
+        self.ledger.mark_done(tile, listing_yield, tile.get("result_total"))
+        METRICS.inc("tiles_done")
+        if tile.get("source") is not None:
+            self.cursor.mark(tile["source"], tile["index"])
+
+    def release_synced(self):
+        """
+        Marca como terminados los tiles cuyas tarjetas ya cubrió un fsync del log
+        (llamar también tras cerrar el almacén, que sincroniza lo que quede)
+        """
+        synced_pages = getattr(self.store, "synced_pages", None)
+        while self.unsynced and (synced_pages is None or self.unsynced[0][0] <= synced_pages):
+            _, tile, listing_yield = self.unsynced.popleft()
+            self._mark_done(tile, listing_yield)
+
+    def handle_result(self, tile, cards_data, stored=False):
+        # stored: las tarjetas ya se guardaron página a página (paginación)
+        if not stored:
+            self.add_cards(cards_data)
+        # Solo el log tiene escrituras pendientes de fsync; los demás almacenes
+        # escriben en disco en cada página y el tile se marca de inmediato
+        written_pages = getattr(self.store, "written_pages", None)
+        if written_pages is None:
+            self._mark_done(tile, len(cards_data))
+        else:
+            self.unsynced.append((written_pages, tile, len(cards_data)))
+            self.release_synced()
+        for observer in self.observers:
+            observer.on_result(tile, cards_data)
+
+# Función para extraer enlaces siguientes y manejarlos eficientemente
+def extract_data_in_groups(drivers, json_files, num_workers=1, storage="sqlite", retry_failed=None,
+                           adaptive_zoom=None, max_zoom=MAX_ZOOM, prioritize=False,
+                           probe_rate=DEFAULT_PROBE_RATE, paginate=False, reviews=False,
+                           incremental=False, record_responses=False, metrics_filepath=None,
+                           metrics_interval=EXPORT_INTERVAL, recycle_pages=DRIVER_MAX_PAGES,
+                           recycle_rss_mb=DRIVER_MAX_RSS_MB, standby=True, standby_lead=STANDBY_LEAD):
+    """
+    - drivers: DriverManager del modo secuencial (None con el pool, donde cada
+      worker tiene el suyo con recycle_pages, recycle_rss_mb, standby y standby_lead).
+    - retry_failed: si no es None, solo se reintentan los tiles fallidos con
+      menos de retry_failed intentos.
+    """
+    global stop_requested
+
+    # Directorio del archivo maestro
+    master_filepath = MASTER_FILEPATH
+    master_dir = os.path.dirname(master_filepath)
+
+    # Ledger de tiles (reemplaza al checkpoint de una sola URL)
+    ledger = TileLedger(os.path.join(master_dir, "tile_ledger.sqlite"))
+    released = ledger.release_dead_owners()
+    if released:
+        logging.info(f"Ledger: liberadas las reservas de {released} ejecuciones anteriores.")
+    migrate_checkpoint(json_files, ledger, os.path.join(master_dir, "checkpoint.json"))
+    if incremental:
+        # Solo se vuelven a visitar los tiles (y sus páginas) de más de un día;
+        # las publicaciones se refrescan según el vencimiento de cada grupo en la caché
+        ledger.reset_stale(TILE_REFRESH_SECONDS)
+
+    store = open_master_store(storage, master_filepath)
+    cursor = ResumeCursor(ledger.get_cursor, ledger.set_cursor)
+    writer = MasterWriter(store, ledger, cursor)
+    logging.info(f"El archivo maestro contiene actualmente {len(store)} listados.")
+
+    # Índice espacial de las publicaciones del maestro, actualizado con cada tile terminado
+    spatial_index = SpatialIndex()
+    spatial_index.insert_many(store.iter_locations())
+    writer.observers.append(spatial_index)
+    logging.info(f"Índice espacial con {len(spatial_index)} publicaciones con coordenadas.")
+
+    # Un solo scraper (y su pool de conexiones) para toda la ejecución,
+    # con caché persistente de publicaciones ya enriquecidas
+    listing_cache = ListingCache(os.path.join(master_dir, "listing_cache.sqlite"))
+    scraper = AirbnbScraper(cache=listing_cache)
+    # Las reseñas comparten la sesión (y el pool de conexiones) del scraper
+    response_cache = None
+    if record_responses:
+        # Se guarda cada respuesta (páginas de búsqueda, /rooms, reseñas) para --replay
+        response_cache = ResponseCache(os.path.join(master_dir, RESPONSE_CACHE_DIR))
+        scraper.session = CachingSession(scraper.session, response_cache)
+    review_fetcher = ReviewFetcher(session=scraper.session, cache=listing_cache) if reviews else None
+
+    # Lectores con acceso directo a los archivos de tiles (planificador)
+    readers = {}
+
+    # Total de tiles para la ETA (en el rastreo adaptativo no se conoce de antemano)
+    if retry_failed is not None:
+        METRICS.set_total_tiles(sum(1 for _ in ledger.iter_failed(retry_failed)))
+    elif adaptive_zoom is None:
+        METRICS.set_total_tiles(max(0, sum(count_tiles(f) for f in json_files if os.path.exists(f))
+                                    - len(ledger.done_ids())))
+    exporter = MetricsExporter(METRICS, metrics_filepath, metrics_interval).start() if metrics_filepath else None
+
+    if retry_failed is not None:
+        logging.info(f"Reintentando solo los tiles fallidos del ledger con menos de {retry_failed} intentos.")
+        tiles = lease_tiles(ledger, ledger.iter_failed(retry_failed))
+    elif adaptive_zoom is not None:
+        # Quadtree desde un zoom grueso: solo se bajan de zoom los tiles saturados
+        logging.info(f"Rastreo adaptativo desde zoom {adaptive_zoom} hasta zoom {max_zoom}.")
+        roots = root_tiles(south_latitude, north_latitude, west_longitude, east_longitude,
+                           tile_size_latitude, tile_size_longitude, adaptive_zoom)
+        # Sin paginación basta una página llena (el resto de resultados no se ve);
+        # con paginación el tile entrega todas sus páginas y solo el tope de búsqueda lo satura
+        card_cap = SEARCH_RESULT_CAP if paginate else RESULTS_PER_PAGE
+        crawl = QuadtreeCrawl(ledger, roots, card_cap=card_cap, max_zoom=max_zoom)
+        writer.observers.append(crawl)
+        tiles = crawl.tiles()
+    elif prioritize:
+        scheduler = YieldScheduler(ledger, spatial_index, south_latitude, west_longitude,
+                                   tile_size_latitude, tile_size_longitude, probe_rate=probe_rate)
+
+        def load_tile(source, index):
+            if source not in readers:
+                readers[source] = TileFileReader(source)
+            return build_tile(readers[source].record(index), source, index)
+
+        # El planificador reserva los tiles y espera los resultados del archivo anterior
+        writer.observers.append(scheduler)
+        tiles = scheduler.schedule(iter_pending_tiles(json_files, ledger.done_ids(), cursor), load_tile)
+    else:
+        tiles = lease_tiles(ledger, iter_pending_tiles(json_files, ledger.done_ids(), cursor))
+
+    # Con paginación, las páginas siguientes de cada tile pasan por la misma cola
+    # y el tile llega al escritor cuando terminan todas
+    sink = writer
+    if paginate:
+        # Páginas visitadas (URL canónica) que persisten entre ejecuciones y archivos de zoom
+        visited_urls = VisitedUrls(os.path.join(master_dir, "visited_urls.sqlite"),
+                                   max_age=TILE_REFRESH_SECONDS if incremental else None)
+        pagination = PaginationCrawl(writer, visited_urls=visited_urls)
+        tiles = pagination.tiles(tiles)
+        sink = pagination
+
+    if num_workers > 1:
+        # Varios navegadores en paralelo; este hilo es el único escritor
+        logging.info(f"Iniciando pool de {num_workers} navegadores.")
+        pool = BrowserWorkerPool(num_workers, setup_webdriver,
+                                 lambda worker_driver, tile: process_tile(worker_driver, tile, scraper,
+                                                                           review_fetcher, response_cache),
+                                 max_pages=recycle_pages, max_rss_mb=recycle_rss_mb, standby=standby,
+                                 standby_lead=standby_lead)
+        pool.run(tiles, sink.handle_result, sink.mark_failed, should_stop=lambda: stop_requested)
+    else:
+        for tile in tiles:
+            if stop_requested:
+                break
+            if tile is None:
                 continue
 
-        if stop_requested:
-            break
+            try:
+                # drivers.get() reemplaza el driver si perdió la sesión o fue reciclado
+                cards_data = process_tile(drivers.get(), tile, scraper, review_fetcher, response_cache)
+                drivers.page_done()
+                sink.handle_result(tile, cards_data)
+            except WebDriverException as e:
+                logging.error(f"Error del WebDriver al procesar el enlace {tile['url']}: {e}")
+                sink.mark_failed(tile, e)
+                drivers.discard()
+                continue
+            except Exception as e:
+                logging.error(f"Error al procesar el enlace {tile['url']}: {e}")
+                sink.mark_failed(tile, e)
+                continue
 
+    for reader in readers.values():
+        reader.close()
+    if paginate:
+        visited_urls.close()
+    listing_cache.close()
+    if response_cache is not None:
+        logging.info(f"Caché de respuestas: {len(response_cache)} respuestas guardadas.")
+        response_cache.close()
+    logging.info(f"Latencia de carga de tiles: {page_latency.summary()}")
+    logging.info(f"Ritmo final por host: {SHARED_LIMITER.summary()}")
+    logging.info(f"Métricas: {METRICS.summary()}")
+    if exporter is not None:
+        exporter.stop()
     logging.info("Todos los archivos JSON han sido procesados.")
 
+    master_df = store.to_dataframe()
+    store.close()
+    # El cierre del almacén sincronizó el log: quedan terminados los últimos tiles
+    writer.release_synced()
+    cursor.flush()
+    logging.info(f"Estado del ledger de tiles: {ledger.summary()}")
+    ledger.close()
     logging.info(f"El archivo maestro contiene actualmente {len(master_df)} listados.")
 
     return master_df  # Retorna los datos maestros actualizados
 
+# Función que vuelve a extraer las páginas de búsqueda guardadas sin navegador ni red.
+# Las publicaciones y reseñas se leen de la caché de respuestas; las tarjetas cuyas
+# respuestas no se grabaron (por ejemplo, servidas por ListingCache) se omiten. El ledger no se toca.
+def replay_responses(storage="sqlite", reviews=False):
+    global stop_requested
+
+    master_dir = os.path.dirname(MASTER_FILEPATH)
+    response_cache = ResponseCache(os.path.join(master_dir, RESPONSE_CACHE_DIR))
+    store = open_master_store(storage, MASTER_FILEPATH)
+
+    # Sin ListingCache: cada publicación se vuelve a parsear desde su respuesta guardada
+    scraper = AirbnbScraper()
+    scraper.session = CachingSession(scraper.session, response_cache, offline=True)
+    review_fetcher = ReviewFetcher(session=scraper.session) if reviews else None
+
+    entries = list(response_cache.iter_entries(SEARCH_PAGE))
+    logging.info(f"Reextrayendo {len(entries)} páginas de búsqueda guardadas.")
+    total_cards = 0
+    skipped_cards = 0
+    for entry in tqdm(entries, desc="Reextrayendo páginas"):
+        if stop_requested:
+            break
+        meta = entry["meta"] or {}
+        try:
+            html = response_cache.read_body(entry["digest"]).decode("utf-8", errors="replace")
+            raw_cards = parse_search_page(html)
+            cards_data = build_cards(raw_cards, meta.get("sw_lat"), meta.get("sw_lng"),
+                                     meta.get("ne_lat"), meta.get("ne_lng"), meta.get("zoom_level"),
+                                     scraper, review_fetcher, skip_missing=True)
+        except Exception as e:
+            logging.error(f"Error al reextraer la página {entry['url']}: {e}")
+            continue
+        METRICS.inc("pages")
+        skipped_cards += len(raw_cards) - len(cards_data)
+        if cards_data:
+            # La fecha de la descarga, no la de hoy: una página vieja no pisa una observación más reciente
+            store.add_cards(cards_data, observed_at=entry["fetched_at"])
+            total_cards += len(cards_data)
+
+    logging.info(f"Reextracción terminada: {total_cards} tarjetas de {len(entries)} páginas; "
+                 f"{skipped_cards} omitidas por no tener sus respuestas en la caché.")
+    master_df = store.to_dataframe()
+    store.close()
+    response_cache.close()
+    return master_df
+
 # Configuración del WebDriver en modo headless y optimizado
 def setup_webdriver():
     options = Options()
     options.headless = True  # Ejecutar en modo headless (sin mostrar la ventana)
+    options.page_load_strategy = PAGE_LOAD_STRATEGY  # No esperar imágenes ni recursos secundarios
 
     # Deshabilitar imágenes para reducir el consumo de memoria
     profile = webdriver.FirefoxProfile()
@@ -408,9 +698,73 @@ def get_zoom_level(filename):
     match = re.search(r'zoom_(\d+)', filename)
     return int(match.group(1)) if match else 0
 
+# Argumentos de línea de comandos
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scraper de Airbnb en Bogotá")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Número de navegadores Firefox en paralelo (por defecto 1)")
+    parser.add_argument("--storage", choices=STORAGE_MODES, default="sqlite",
+                        help="sqlite: maestro indexado con upsert por zoom (por defecto); "
+                             "json: reescribe el maestro en cada página; "
+                             "log: agrega a un log y compacta periódicamente")
+    parser.add_argument("--adaptive", type=int, metavar="ZOOM", default=None,
+                        help="Rastreo adaptativo: empieza en este zoom y solo subdivide los tiles saturados")
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM,
+                        help=f"Zoom máximo del rastreo adaptativo (por defecto {MAX_ZOOM})")
+    parser.add_argument("--prioritize", action="store_true",
+                        help="Omite los tiles que quedaron vacíos y ordena el resto por rendimiento esperado")
+    parser.add_argument("--probe-rate", type=float, default=DEFAULT_PROBE_RATE,
+                        help=f"Fracción de tiles vacíos que se visitan igual con --prioritize "
+                             f"(por defecto {DEFAULT_PROBE_RATE})")
+    parser.add_argument("--paginate", action="store_true",
+                        help="Visita también las páginas siguientes de cada tile, en paralelo con --workers")
+    parser.add_argument("--reviews", action="store_true",
+                        help="Descarga todas las reseñas de cada publicación por HTTP (fecha, calificación, idioma)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Vuelve a visitar solo los tiles terminados hace más de un día")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Guarda en disco cada página y respuesta descargada para poder usar --replay")
+    parser.add_argument("--replay", action="store_true",
+                        help="Vuelve a extraer las páginas guardadas con --response-cache, sin navegador ni red")
+    parser.add_argument("--metrics", metavar="ARCHIVO", default=None,
+                        help="Exporta tiempos por etapa, contadores, ritmo y ETA a este archivo "
+                             "(.json, o texto de Prometheus con cualquier otra extensión)")
+    parser.add_argument("--metrics-interval", type=float, default=EXPORT_INTERVAL,
+                        help=f"Segundos entre exportaciones de --metrics (por defecto {EXPORT_INTERVAL})")
+    parser.add_argument("--profile", metavar="CARPETA", default=None,
+                        help="Perfila las etapas y escribe pilas plegadas (flamegraph) y diferencias de "
+                             "tracemalloc en esta carpeta (también con la variable AIRBNB_PROFILE)")
+    parser.add_argument("--profile-every", type=int, default=None,
+                        help=f"Páginas entre volcados del perfilado (por defecto {PROFILE_EVERY_PAGES})")
+    parser.add_argument("--profile-stages", default=None,
+                        help="Etapas a perfilar separadas por coma, por ejemplo extract_listings,pandas_merge,json_save "
+                             "(por defecto todas)")
+    parser.add_argument("--profile-no-memory", action="store_true",
+                        help="Perfila solo las pilas, sin tracemalloc (que hace el proceso varias veces "
+                             "más lento; también con AIRBNB_PROFILE_MEMORY=0)")
+    parser.add_argument("--recycle-pages", type=int, default=DRIVER_MAX_PAGES,
+                        help=f"Recicla cada navegador tras este número de páginas (por defecto {DRIVER_MAX_PAGES}; 0 = nunca)")
+    parser.add_argument("--recycle-rss-mb", type=float, default=DRIVER_MAX_RSS_MB,
+                        help=f"Recicla el navegador cuando geckodriver + Firefox pasan de estos MB "
+                             f"(por defecto {DRIVER_MAX_RSS_MB}; 0 = nunca)")
+    parser.add_argument("--no-standby", action="store_true",
+                        help="No lanza un navegador de reserva antes de reciclar (el cambio paga el arranque en frío)")
+    parser.add_argument("--standby-lead", type=float, default=STANDBY_LEAD,
+                        help=f"Fracción de un límite de reciclaje desde la que se lanza la reserva "
+                             f"(por defecto {STANDBY_LEAD}; 0 = siempre hay una lista, también para "
+                             f"reemplazar un navegador caído)")
+    parser.add_argument("--retry-failed", type=int, nargs="?", const=MAX_RETRY_ATTEMPTS, default=None,
+                        metavar="MAX_INTENTOS",
+                        help=f"Procesa únicamente los tiles marcados como fallidos en el ledger que tengan "
+                             f"menos de MAX_INTENTOS intentos (por defecto {MAX_RETRY_ATTEMPTS})")
+    return parser.parse_args()
+
 def main():
     global stop_requested
 
+    args = parse_args()
+    setup_logging()
+
     # Registrar el manejador de señal para Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
 
@@ -422,6 +776,9 @@ def main():
         "/home/jjleo/Entorno/Python/airbnb_scraper/airbnb_urls_bogota_zoom_20.json",
     ]
 
+    # Usar el formato binario .tiles cuando exista junto al JSONL
+    json_files = [resolve_tile_file(f) for f in json_files]
+
     # Ordenar por nivel de zoom
     json_files = sorted(json_files, key=get_zoom_level)
 
@@ -430,14 +787,47 @@ def main():
     for f in json_files:
         print(f)
 
-    driver = setup_webdriver()
+    # Perfilado opcional de las etapas (--profile o la variable AIRBNB_PROFILE)
+    profiler = profiler_from_options(args.profile, args.profile_every, args.profile_stages,
+                                     False if args.profile_no_memory else None)
+    if profiler is not None:
+        profiler.start()
+
+    if args.replay:
+        # Sin navegador ni red: todo sale de la caché de respuestas
+        try:
+            replay_responses(storage=args.storage, reviews=args.reviews)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+        return
+
+    # En modo pool cada worker crea y cierra su propio driver
+    drivers = DriverManager(setup_webdriver, args.recycle_pages, args.recycle_rss_mb,
+                            standby=not args.no_standby,
+                            standby_lead=args.standby_lead) if args.workers <= 1 else None
     try:
-        master_df = extract_data_in_groups(driver, json_files)
+        master_df = extract_data_in_groups(drivers, json_files, num_workers=args.workers,
+                                           storage=args.storage, retry_failed=args.retry_failed,
+                                           adaptive_zoom=args.adaptive, max_zoom=args.max_zoom,
+                                           prioritize=args.prioritize, probe_rate=args.probe_rate,
+                                           paginate=args.paginate, reviews=args.reviews,
+                                           incremental=args.incremental,
+                                           record_responses=args.response_cache,
+                                           metrics_filepath=args.metrics,
+                                           metrics_interval=args.metrics_interval,
+                                           recycle_pages=args.recycle_pages,
+                                           recycle_rss_mb=args.recycle_rss_mb,
+                                           standby=not args.no_standby,
+                                           standby_lead=args.standby_lead)
     except Exception as e:
         logging.error(f"Error en el proceso principal: {e}")
     finally:
-        driver.quit()
-        logging.info("WebDriver cerrado correctamente.")
+        if drivers is not None:
+            drivers.close()
+            logging.info("WebDriver cerrado correctamente.")
+        if profiler is not None:
+            profiler.stop()
 
         # Guardar estado final si el programa fue detenido
         if stop_requested:
@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from esperas import LatencyHistogram
+
+# Prefijo de los nombres de métricas en el formato de Prometheus
+METRIC_PREFIX = "airbnb_scraper"
+
+# Ventana (segundos) del ritmo móvil con que se calcula el throughput y la ETA
+ROLLING_WINDOW = 300
+
+# Intervalo por defecto entre exportaciones (segundos)
+EXPORT_INTERVAL = 30
+
+# Latencia mínima del histograma de etapas (ms): las escrituras en SQLite tardan fracciones de ms
+STAGE_MIN_MS = 0.1
+
+# Percentiles que se exportan por etapa
+QUANTILES = (50, 90, 99)
+
+# Descripciones de los contadores conocidos (los demás se exportan sin ayuda)
+COUNTER_HELP = {
+    "pages": "Páginas de búsqueda visitadas",
+    "listings": "Tarjetas escritas en el maestro",
+    "tiles_done": "Tiles terminados",
+    "tiles_failed": "Tiles fallidos",
+    "retries": "Reintentos de peticiones",
+    "cache_hits": "Publicaciones servidas desde la caché",
+    "cache_misses": "Publicaciones descargadas por no estar vigentes en la caché",
+    "bytes_written": "Bytes escritos en el maestro",
+    "driver_recycles": "Drivers reciclados por páginas o memoria",
+}
+
+
+# Tiempo acumulado y distribución de latencias de una etapa
+class StageTimer:
+    def __init__(self):
+        self.histogram = LatencyHistogram(min_ms=STAGE_MIN_MS)
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        self.histogram.record(seconds)
+        with self.lock:
+            self.seconds += seconds
+
+
+# Registro de métricas del proceso: temporizadores por etapa, contadores,
+# ritmo móvil y ETA sobre el total de tiles
+class Metrics:
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.counters = dict.fromkeys(COUNTER_HELP, 0)
+        self.total_tiles = None
+        # Muestras (instante, páginas, tarjetas, tiles terminados) para el ritmo móvil
+        self.samples = deque()
+        # Etapa en curso de cada hilo (la usa el perfilador para atribuir muestras)
+        self.active = {}
+
+    def _stage(self, name):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageTimer()
+            return self.stages[name]
+
+    @contextmanager
+    def timer(self, stage):
+        # Mide el bloque aunque lance una excepción
+        with self.attributed(stage):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def attributed(self, stage):
+        # Cuenta el hilo dentro de la etapa (para el perfilador) sin medir el bloque
+        thread = threading.get_ident()
+        outer = self.active.get(thread)
+        self.active[thread] = stage
+        try:
+            yield
+        finally:
+            if outer is None:
+                self.active.pop(thread, None)
+            else:
+                self.active[thread] = outer
+
+    def propagate(self, fn):
+        """
+        Envuelve fn para que el hilo que la ejecute (por ejemplo, un worker de un
+        ThreadPoolExecutor) cuente en la etapa en curso del hilo que la envuelve.
+        La duración la mide solo el hilo que espera, sin contarla dos veces.
+        """
+        stage = self.active.get(threading.get_ident())
+        if stage is None:
+            return fn
+
+        def run(*args, **kwargs):
+            with self.attributed(stage):
+                return fn(*args, **kwargs)
+        return run
+
+    def observe(self, stage, seconds):
+        self._stage(stage).record(seconds)
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_total_tiles(self, total):
+        """
+        - total: tiles por visitar en esta ejecución (None si no se conoce,
+          como en el rastreo adaptativo).
+        """
+        with self.lock:
+            self.total_tiles = total
+
+    def _rates(self, now):
+        # Ritmo entre la muestra más antigua de la ventana y el estado actual
+        current = (now, self.counters["pages"], self.counters["listings"],
+                   self.counters["tiles_done"] + self.counters["tiles_failed"])
+        self.samples.append(current)
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+        oldest = self.samples[0]
+        elapsed = now - oldest[0]
+        if elapsed <= 0:
+            return 0.0, 0.0, 0.0
+        return tuple((current[i] - oldest[i]) / elapsed for i in (1, 2, 3))
+
+    def snapshot(self):
+        """
+        Retorna un diccionario con contadores, etapas, ritmo móvil y ETA
+        """
+        now = time.time()
+        with self.lock:
+            counters = dict(self.counters)
+            stages = dict(self.stages)
+            pages_rate, listings_rate, tiles_rate = self._rates(now)
+            total_tiles = self.total_tiles
+
+        finished = counters["tiles_done"] + counters["tiles_failed"]
+        remaining = max(0, total_tiles - finished) if total_tiles is not None else None
+        eta = remaining / tiles_rate if remaining is not None and tiles_rate > 0 else None
+        return {
+            "timestamp": now,
+            "uptime_seconds": now - self.started,
+            "counters": counters,
+            "stages": {
+                name: {
+                    "count": stage.histogram.total,
+                    "seconds": stage.seconds,
+                    **{f"p{q}": stage.histogram.percentile(q) for q in QUANTILES},
+                }
+                for name, stage in stages.items()
+            },
+            "pages_per_second": pages_rate,
+            "listings_per_second": listings_rate,
+            "tiles_per_second": tiles_rate,
+            "tiles_total": total_tiles,
+            "tiles_remaining": remaining,
+            "eta_seconds": eta,
+        }
+
+    def summary(self):
+        snapshot = self.snapshot()
+        stages = ", ".join(f"{name}={stage['seconds']:.1f}s" for name, stage in
+                           sorted(snapshot["stages"].items(), key=lambda item: -item[1]["seconds"]))
+        eta = f"{snapshot['eta_seconds'] / 60:.0f} min" if snapshot["eta_seconds"] is not None else "desconocida"
+        return (f"{snapshot['pages_per_second'] * 60:.1f} páginas/min, "
+                f"{snapshot['listings_per_second'] * 60:.1f} listados/min, ETA {eta}; etapas: {stages or 'sin datos'}")
+
+
+# Función que convierte una instantánea al formato de texto de Prometheus
+def render_prometheus(snapshot):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{full_name}{{{label_text}}} {value:.6g}" if label_text else f"{full_name} {value:.6g}")
+
+    for name, value in sorted(snapshot["counters"].items()):
+        metric(f"{name}_total", "counter", COUNTER_HELP.get(name, name), [({}, value)])
+
+    stages = sorted(snapshot["stages"].items())
+    metric("stage_seconds", "summary", "Duración de cada etapa del scraper",
+           [({"stage": name, "quantile": f"{q / 100:g}"}, stage[f"p{q}"]) for name, stage in stages for q in QUANTILES])
+    lines.extend(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6g}' for name, stage in stages)
+    lines.extend(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {stage["count"]}' for name, stage in stages)
+
+    metric("pages_per_second", "gauge", "Páginas por segundo (ventana móvil)", [({}, snapshot["pages_per_second"])])
+    metric("listings_per_second", "gauge", "Tarjetas por segundo (ventana móvil)",
+           [({}, snapshot["listings_per_second"])])
+    metric("tiles_remaining", "gauge", "Tiles por visitar", [({}, snapshot["tiles_remaining"])])
+    metric("eta_seconds", "gauge", "Tiempo estimado para terminar los tiles", [({}, snapshot["eta_seconds"])])
+    metric("uptime_seconds", "gauge", "Segundos desde el inicio", [({}, snapshot["uptime_seconds"])])
+    return "\n".join(lines) + "\n"
+
+
+# Exportador periódico: escribe la instantánea en un archivo (.json o texto de
+# Prometheus, apto para el textfile collector de node_exporter)
+class MetricsExporter:
+    def __init__(self, metrics, filepath, interval=EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.filepath = filepath
+        self.interval = interval
+        self.as_json = filepath.endswith(".json")
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def export(self):
+        snapshot = self.metrics.snapshot()
+        text = json.dumps(snapshot, indent=2) if self.as_json else render_prometheus(snapshot)
+        # Escritura atómica: el lector nunca ve un archivo a medias
+        tmp_filepath = f"{self.filepath}.tmp"
+        with open(tmp_filepath, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_filepath, self.filepath)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.export()
+            except OSError as e:
+                logging.error(f"Error al exportar métricas a {self.filepath}: {e}")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        # Última exportación con el estado final
+        self.stopped.set()
+        self.thread.join()
+        self.export()
+
+
+# Métricas compartidas por todas las etapas del proceso
+METRICS = Metrics()
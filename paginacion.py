@@ -0,0 +1,200 @@
+import json
+import base64
+import logging
+import urllib.parse
+from collections import deque
+
+# Resultados que Airbnb muestra por página de búsqueda
+RESULTS_PER_PAGE = 18
+
+# Airbnb no muestra más de 15 páginas por búsqueda
+MAX_PAGES = 15
+
+# Parámetros de paginación que se reemplazan al generar la URL de una página
+PAGINATION_PARAMS = ("items_offset", "cursor", "pagination_search")
+
+# Marca de fin del iterador de tiles
+_EXHAUSTED = object()
+
+# Script que lee los enlaces de los botones de página (respaldo si no hay total)
+PAGE_LINKS_SCRIPT = """
+return Array.from(document.getElementsByClassName('c1ackr0h'))
+    .map(el => el.href || el.getAttribute('href'))
+    .filter(Boolean);
+"""
+
+
+# Función que arma la URL de una página de resultados a partir del desplazamiento
+def page_url(url, items_offset):
+    parts = urllib.parse.urlsplit(url)
+    query = [(key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+             if key not in PAGINATION_PARAMS]
+    if items_offset:
+        query += [("items_offset", str(items_offset)), ("pagination_search", "true")]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, safe=",")))
+
+
+# Función que obtiene el desplazamiento de un enlace de página (items_offset o cursor)
+def link_offset(url):
+    params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+    if "items_offset" in params:
+        try:
+            return int(params["items_offset"])
+        except ValueError:
+            return None
+    if "cursor" in params:
+        # El cursor es un JSON en base64 con items_offset
+        try:
+            cursor = params["cursor"]
+            decoded = json.loads(base64.b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return int(decoded["items_offset"])
+        except (ValueError, KeyError, TypeError):
+            return None
+    return None
+
+
+# Función que calcula los desplazamientos de las páginas siguientes según el total anunciado
+def page_offsets(result_total, max_pages=MAX_PAGES):
+    last = min(result_total, max_pages * RESULTS_PER_PAGE)
+    return list(range(RESULTS_PER_PAGE, last, RESULTS_PER_PAGE))
+
+
+# Etapa de paginación: cada tile visitado agrega sus páginas siguientes a la
+# frontera, y el tile se entrega al escritor cuando terminan todas sus páginas
+class PaginationCrawl:
+    def __init__(self, writer, max_pages=MAX_PAGES, visited_urls=None):
+        """
+        - writer: MasterWriter que guarda las tarjetas de cada página y recibe
+          el tile completo (add_cards / handle_result / mark_failed).
+        - visited_urls: conjunto persistente de páginas ya visitadas (VisitedUrls),
+          para no cargar dos veces la misma página entre ejecuciones.
+        """
+        self.writer = writer
+        self.max_pages = max_pages
+        self.visited_urls = visited_urls
+        self.pages_skipped = 0
+        self.frontier = deque()
+        self.open_tiles = {}  # tile_id -> estado de las páginas del tile
+        self.pages_visited = 0
+
+    def tiles(self, tiles):
+        """
+        Generador para el pool: primero las páginas pendientes (así las páginas
+        de un mismo tile se reparten entre los workers), luego tiles nuevos.
+        Entrega None mientras espera páginas de tiles en curso.
+        """
+        tiles = iter(tiles)
+        exhausted = False
+        while True:
+            if self.frontier:
+                yield self.frontier.popleft()
+                continue
+            if not exhausted:
+                # El iterador de origen puede entregar None si está esperando (rastreo adaptativo)
+                tile = next(tiles, _EXHAUSTED)
+                if tile is not _EXHAUSTED:
+                    yield tile
+                    continue
+                exhausted = True
+            if not self.open_tiles:
+                break
+            yield None
+
+        logging.info(f"Paginación terminada: {self.pages_visited} páginas adicionales visitadas, "
+                     f"{self.pages_skipped} ya visitadas en ejecuciones anteriores.")
+
+    def _new_pages(self, state, offsets, links=()):
+        pages = []
+        for offset in offsets:
+            if offset not in state["visited"] and offset < self.max_pages * RESULTS_PER_PAGE:
+                state["visited"].add(offset)
+                pages.append((offset, page_url(state["tile"]["url"], offset)))
+        for link in links:
+            offset = link_offset(link)
+            key = offset if offset is not None else link
+            if key in state["visited"] or (offset is not None and offset >= self.max_pages * RESULTS_PER_PAGE):
+                continue
+            state["visited"].add(key)
+            pages.append((offset, page_url(state["tile"]["url"], offset) if offset is not None else link))
+
+        if self.visited_urls is not None:
+            known = [page for page in pages if page[1] in self.visited_urls]
+            self.pages_skipped += len(known)
+            pages = [page for page in pages if page[1] not in self.visited_urls]
+
+        for offset, url in pages:
+            page = {key: value for key, value in state["tile"].items()
+                    if key not in ("attempts", "result_total", "page_links")}
+            page.update(url=url, page_offset=offset, parent_id=state["tile"]["tile_id"])
+            self.frontier.append(page)
+        state["pending"] += len(pages)
+
+    def _store_cards(self, state, cards_data):
+        # Cada página se guarda al llegar, así una página ya visitada nunca se pierde.
+        # Las páginas pueden repetir publicaciones: se conserva la primera aparición
+        new_cards = [card for card in cards_data if card["id"] not in state["ids"]]
+        state["ids"].update(card["id"] for card in new_cards)
+        state["cards"].extend(new_cards)
+        self.writer.add_cards(new_cards)
+
+    def _finish(self, state):
+        del self.open_tiles[state["tile"]["tile_id"]]
+        if state["error"] is None:
+            try:
+                self.writer.handle_result(state["tile"], state["cards"], stored=True)
+                return
+            except Exception as e:
+                logging.error(f"Error al cerrar el tile {state['tile']['tile_id']}: {e}")
+                state["error"] = e
+        self.writer.mark_failed(state["tile"], state["error"])
+
+    def _page_finished(self, state, error=None):
+        # Único lugar donde se descuenta una página pendiente del tile
+        state["pending"] -= 1
+        if error is not None:
+            state["error"] = error
+        if state["pending"] == 0:
+            self._finish(state)
+
+    def handle_result(self, tile, cards_data):
+        if "page_offset" not in tile:
+            state = {"tile": tile, "cards": [], "ids": set(), "pending": 0, "error": None, "visited": {0}}
+            self.open_tiles[tile["tile_id"]] = state
+            try:
+                self._store_cards(state, cards_data)
+                if cards_data:
+                    if tile.get("result_total") is not None:
+                        self._new_pages(state, page_offsets(tile["result_total"], self.max_pages))
+                    else:
+                        self._new_pages(state, (), tile.get("page_links", ()))
+            except Exception:
+                # Sin páginas en cola: el tile no queda abierto y el llamador lo reporta con mark_failed
+                del self.open_tiles[tile["tile_id"]]
+                raise
+            if state["pending"]:
+                logging.info(f"Tile {tile['tile_id']}: {state['pending']} páginas adicionales en cola.")
+            else:
+                self._finish(state)
+            return
+
+        # Una página siguiente no lanza: si falla al guardarse, el error queda en
+        # su tile y la página se descuenta igual (una sola vez)
+        state = self.open_tiles[tile["parent_id"]]
+        error = None
+        self.pages_visited += 1
+        try:
+            self._store_cards(state, cards_data)
+            if self.visited_urls is not None:
+                self.visited_urls.add(tile["url"])
+            if cards_data and state["tile"].get("result_total") is None:
+                self._new_pages(state, (), tile.get("page_links", ()))
+        except Exception as e:
+            logging.error(f"Error al guardar la página {tile['url']}: {e}")
+            error = e
+        self._page_finished(state, error)
+
+    def mark_failed(self, tile, error=None):
+        if "page_offset" not in tile:
+            self.writer.mark_failed(tile, error)
+            return
+        self._page_finished(self.open_tiles[tile["parent_id"]], error)
@@ -0,0 +1,150 @@
+import os
+import sys
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+from metricas import METRICS
+
+# Variables de entorno que activan el perfilado sin tocar la línea de comandos
+PROFILE_ENV = "AIRBNB_PROFILE"
+PROFILE_EVERY_ENV = "AIRBNB_PROFILE_EVERY"
+PROFILE_STAGES_ENV = "AIRBNB_PROFILE_STAGES"
+PROFILE_MEMORY_ENV = "AIRBNB_PROFILE_MEMORY"
+
+# Páginas entre volcados, intervalo de muestreo (segundos) y marcos guardados por asignación
+PROFILE_EVERY_PAGES = 100
+SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_FRAMES = 10
+
+# Asignaciones que se listan en cada diferencia de tracemalloc
+TOP_ALLOCATIONS = 30
+
+# Profundidad máxima de pila que se recorre por muestra
+MAX_STACK_DEPTH = 128
+
+
+# Función que nombra un marco de pila para el formato plegado (sin ';', que separa marcos)
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+# Función que arma la pila plegada de un marco, de la raíz hacia adentro
+def collapse_stack(frame, root):
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+# Perfilador por muestreo de las etapas del scraper: cada SAMPLE_INTERVAL
+# toma la pila de los hilos que están dentro de una etapa medida por METRICS
+# o que trabajan para ella (METRICS.propagate), con la etapa como raíz, y cada
+# every_pages páginas escribe las pilas plegadas (flamegraph.pl, speedscope,
+# inferno) y la diferencia de tracemalloc
+class StageProfiler:
+    def __init__(self, output_dir, every_pages=PROFILE_EVERY_PAGES, stages=None,
+                 interval=SAMPLE_INTERVAL, trace_memory=True, metrics=METRICS):
+        """
+        - stages: nombres de etapas a perfilar (None = todas las de METRICS).
+        - trace_memory: activa tracemalloc. Rastrear cada asignación hace el proceso
+          varias veces más lento; el muestreo de pilas solo casi no se nota.
+        """
+        self.output_dir = output_dir
+        self.every_pages = every_pages
+        self.stages = set(stages) if stages else None
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.metrics = metrics
+        self.stacks = Counter()
+        self.samples = 0
+        self.dumps = 0
+        self.next_dump = every_pages
+        self.memory_snapshot = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="perfilador", daemon=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for thread, stage in list(self.metrics.active.items()):
+            if self.stages is not None and stage not in self.stages:
+                continue
+            frame = frames.get(thread)
+            if frame is not None:
+                self.stacks[collapse_stack(frame, stage)] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._sample()
+            if self.metrics.counters["pages"] >= self.next_dump:
+                self.next_dump = self.metrics.counters["pages"] + self.every_pages
+                self.dump()
+
+    def dump(self):
+        """
+        Escribe las pilas acumuladas desde el volcado anterior y la diferencia de memoria
+        """
+        self.dumps += 1
+        pages = self.metrics.counters["pages"]
+        stacks, self.stacks = self.stacks, Counter()
+        stacks_filepath = os.path.join(self.output_dir, f"stacks-{self.dumps:04d}-p{pages}.folded")
+        with open(stacks_filepath, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        logging.info(f"Perfilado: {sum(stacks.values())} muestras en {stacks_filepath}.")
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            memory_filepath = os.path.join(self.output_dir, f"tracemalloc-{self.dumps:04d}-p{pages}.txt")
+            with open(memory_filepath, "w", encoding="utf-8") as f:
+                f.write(f"Página {pages}: memoria rastreada {current / 1024 ** 2:.1f} MB "
+                        f"(pico {peak / 1024 ** 2:.1f} MB)\n\n")
+                if self.memory_snapshot is None:
+                    f.write("Asignaciones más grandes:\n")
+                    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                        f.write(f"{stat}\n")
+                else:
+                    f.write("Mayores cambios desde el volcado anterior:\n")
+                    for stat in snapshot.compare_to(self.memory_snapshot, "lineno")[:TOP_ALLOCATIONS]:
+                        f.write(f"{stat}\n")
+            self.memory_snapshot = snapshot
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.thread.start()
+        logging.info(f"Perfilado activo en {self.output_dir}: volcado cada {self.every_pages} páginas, "
+                     f"etapas {', '.join(sorted(self.stages)) if self.stages else 'todas'}.")
+        return self
+
+    def stop(self):
+        # Último volcado con lo que quedó desde el anterior
+        self.stopped.set()
+        self.thread.join()
+        self.dump()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# Función que crea el perfilador a partir de la línea de comandos o del entorno.
+# Retorna None si el perfilado no está activo.
+def profiler_from_options(output_dir=None, every_pages=None, stages=None, trace_memory=None):
+    output_dir = output_dir or os.environ.get(PROFILE_ENV)
+    if not output_dir:
+        return None
+    every_pages = every_pages or int(os.environ.get(PROFILE_EVERY_ENV) or PROFILE_EVERY_PAGES)
+    stages = stages or os.environ.get(PROFILE_STAGES_ENV)
+    if isinstance(stages, str):
+        stages = [stage.strip() for stage in stages.split(",") if stage.strip()]
+    if trace_memory is None:
+        trace_memory = os.environ.get(PROFILE_MEMORY_ENV, "1") != "0"
+    return StageProfiler(output_dir, every_pages=every_pages, stages=stages, trace_memory=trace_memory)
@@ -0,0 +1,140 @@
+import math
+import random
+import logging
+from array import array
+import numpy as np
+
+from generador_urls import adjust_tile_size_by_zoom
+from ledger_tiles import tile_id
+
+# Fracción de tiles vacíos en la ejecución anterior que se vuelven a visitar
+DEFAULT_PROBE_RATE = 0.05
+
+
+# Función que interpreta el rendimiento registrado de un tile (solo se registra
+# con un resultado confirmado: los timeouts y errores quedan como fallidos)
+def observed_yield(record):
+    listing_yield, result_total = record
+    return max(listing_yield, result_total or 0)
+
+
+# Planificador: descarta los tiles que quedaron vacíos y ordena el resto por rendimiento esperado.
+# Reserva él mismo los tiles y observa al escritor (on_result / on_failure), como el
+# rastreo adaptativo, para no planificar un archivo con tiles del anterior aún en curso
+class YieldScheduler:
+    def __init__(self, ledger, index, south_lat, west_lng, tile_size_lat, tile_size_lng,
+                 probe_rate=DEFAULT_PROBE_RATE, seed=None):
+        """
+        - index: SpatialIndex con las publicaciones del maestro (se actualiza
+          durante la ejecución, así cada archivo se planifica con lo último).
+        - south_lat, west_lng, tile_size_lat, tile_size_lng: origen y tamaño base
+          de la grilla de tiles, para encontrar los tiles de zoom más grueso que
+          contienen a cada tile.
+        - probe_rate: probabilidad de visitar igual un tile que se espera vacío.
+        """
+        self.ledger = ledger
+        self.index = index
+        self.south_lat = south_lat
+        self.west_lng = west_lng
+        self.tile_size_lat = tile_size_lat
+        self.tile_size_lng = tile_size_lng
+        self.probe_rate = probe_rate
+        self.random = random.Random(seed)
+        self.yields = {}
+        self.zooms = []
+        # Tiles entregados que el escritor aún no ha recibido
+        self.in_flight = 0
+        # Rendimientos recibidos que aún no están en el ledger (el log agrupa los fsync)
+        self.unrecorded = {}
+
+    def refresh(self):
+        # Rendimientos registrados en el ledger (incluye lo terminado en esta ejecución)
+        self.yields = self.ledger.yield_map()
+        self.unrecorded = {key: record for key, record in self.unrecorded.items() if key not in self.yields}
+        self.yields.update(self.unrecorded)
+        self.zooms = sorted({int(key.split(":", 1)[0]) for key in self.yields}, reverse=True)
+
+    def on_result(self, tile, cards_data):
+        self.in_flight -= 1
+        self.unrecorded[tile["tile_id"]] = (len(cards_data), tile.get("result_total"))
+
+    def on_failure(self, tile, error=None):
+        self.in_flight -= 1
+
+    def _ancestor_yield(self, tile):
+        """
+        Rendimiento del tile registrado más fino que contiene al centro del tile,
+        escalado a su área. Retorna None si no hay ninguno.
+        """
+        center_lat = (tile["sw_lat"] + tile["ne_lat"]) / 2
+        center_lng = (tile["sw_lng"] + tile["ne_lng"]) / 2
+        for zoom_level in self.zooms:
+            if zoom_level >= tile["zoom_level"]:
+                continue
+            size_lat = adjust_tile_size_by_zoom(self.tile_size_lat, zoom_level)
+            size_lng = adjust_tile_size_by_zoom(self.tile_size_lng, zoom_level)
+            sw_lat = self.south_lat + math.floor((center_lat - self.south_lat) / size_lat) * size_lat
+            sw_lng = self.west_lng + math.floor((center_lng - self.west_lng) / size_lng) * size_lng
+            record = self.yields.get(tile_id(zoom_level, sw_lat, sw_lng))
+            if record is not None and observed_yield(record) is not None:
+                return observed_yield(record) / 4 ** (tile["zoom_level"] - zoom_level)
+        return None
+
+    def expected_yield(self, tile):
+        """
+        Retorna (rendimiento esperado, vacío_conocido) a partir de la visita
+        anterior del tile, de su ancestro más fino y de las publicaciones conocidas
+        dentro del tile
+        """
+        known = self.index.count_bbox(tile["sw_lat"], tile["sw_lng"], tile["ne_lat"], tile["ne_lng"])
+        record = self.yields.get(tile["tile_id"])
+        observed = observed_yield(record) if record is not None else None
+        if observed is None:
+            observed = self._ancestor_yield(tile)
+        if observed is None:
+            return known, False
+        return max(observed, known), observed == 0 and known == 0
+
+    def _drain(self, source, scores, indices, skipped, load_tile):
+        if source is None:
+            return
+        logging.info(f"Planificador: {len(indices)} tiles de {source} ordenados por rendimiento esperado, "
+                     f"{skipped} tiles vacíos omitidos.")
+        # Orden estable: a igual rendimiento se respeta el orden del archivo
+        order = np.argsort(-np.frombuffer(scores, dtype=np.float64), kind="stable")
+        for position in order.tolist():
+            tile = load_tile(source, indices[position])
+            if not self.ledger.lease(tile):
+                continue
+            self.in_flight += 1
+            yield tile
+
+    def schedule(self, tiles, load_tile):
+        """
+        - tiles: tiles pendientes, agrupados por archivo de origen.
+        - load_tile(source, index): vuelve a leer un tile por su posición.
+        Cada archivo se planifica al terminar el anterior, para aprovechar los
+        rendimientos del zoom más grueso: con el pool se entrega None hasta que
+        el escritor recibe los tiles en curso. Solo se guardan (rendimiento,
+        posición) por tile, no los tiles completos. Los tiles se entregan reservados.
+        """
+        source = None
+        scores, indices, skipped = array("d"), array("Q"), 0
+        for tile in tiles:
+            if tile["source"] != source:
+                yield from self._drain(source, scores, indices, skipped, load_tile)
+                # Un tile en curso contaría como sin rendimiento (ni él ni sus publicaciones
+                # están aún en el ledger ni en el índice) y hundiría a los tiles que contiene
+                while self.in_flight > 0:
+                    yield None
+                source = tile["source"]
+                scores, indices, skipped = array("d"), array("Q"), 0
+                self.refresh()
+
+            expected, known_empty = self.expected_yield(tile)
+            if known_empty and self.random.random() >= self.probe_rate:
+                skipped += 1
+                continue
+            scores.append(expected)
+            indices.append(tile["index"])
+        yield from self._drain(source, scores, indices, skipped, load_tile)
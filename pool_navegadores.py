@@ -0,0 +1,179 @@
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+from selenium.common.exceptions import WebDriverException
+
+from ciclo_drivers import DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB, STANDBY_LEAD, DriverManager
+
+# Número máximo de intentos por tile antes de darlo por fallido
+MAX_TILE_ATTEMPTS = 3
+
+# Tiles en cola por cada worker (limita la memoria del iterador de tiles)
+QUEUE_DEPTH_PER_WORKER = 4
+
+# Marca de fin del iterador de tiles
+_EXHAUSTED = object()
+
+
+# Pool de navegadores Firefox que toman tiles de una cola compartida
+class BrowserWorkerPool:
+    def __init__(self, num_workers, setup_driver, process_tile, max_pages=DRIVER_MAX_PAGES,
+                 max_rss_mb=DRIVER_MAX_RSS_MB, standby=True, standby_lead=STANDBY_LEAD):
+        """
+        - num_workers: número de navegadores en paralelo.
+        - setup_driver: función que crea un driver nuevo.
+        - process_tile: función (driver, tile) -> lista de tarjetas.
+        - max_pages, max_rss_mb, standby, standby_lead: reciclaje del driver de cada worker (DriverManager).
+        """
+        self.num_workers = num_workers
+        self.setup_driver = setup_driver
+        self.process_tile = process_tile
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.standby = standby
+        self.standby_lead = standby_lead
+        self.tile_queue = queue.Queue(maxsize=num_workers * QUEUE_DEPTH_PER_WORKER)
+        self.result_queue = queue.Queue()
+        self.in_flight = {}  # worker_id -> tile que está procesando
+        self.lock = threading.Lock()
+        self.threads = {}
+
+    def _worker(self, worker_id):
+        drivers = DriverManager(self.setup_driver, self.max_pages, self.max_rss_mb, self.standby,
+                                name=f"worker {worker_id}", standby_lead=self.standby_lead)
+        try:
+            while True:
+                tile = self.tile_queue.get()
+                if tile is None:
+                    break
+                with self.lock:
+                    self.in_flight[worker_id] = tile
+
+                error = None
+                cards_data = None
+                try:
+                    cards_data = self.process_tile(drivers.get(), tile)
+                    drivers.page_done()
+                except WebDriverException as e:
+                    # El driver quedó inservible: se descarta y el siguiente tile usa la reserva u otro nuevo
+                    logging.error(f"[worker {worker_id}] Error del WebDriver en {tile['url']}: {e}")
+                    error = e
+                    drivers.discard()
+                except Exception as e:
+                    logging.error(f"[worker {worker_id}] Error al procesar {tile['url']}: {e}")
+                    error = e
+
+                # Se libera el tile antes de reportarlo para que el supervisor no lo duplique
+                with self.lock:
+                    self.in_flight.pop(worker_id, None)
+                self.result_queue.put((tile, cards_data, error))
+        finally:
+            drivers.close()
+
+    def _start_worker(self, worker_id):
+        thread = threading.Thread(target=self._worker, args=(worker_id,), name=f"browser-worker-{worker_id}", daemon=True)
+        self.threads[worker_id] = thread
+        thread.start()
+
+    def _supervise(self, retry_tiles):
+        # Reinicia los workers que murieron y recupera el tile que tenían.
+        # Retorna cuántos tiles en curso se recuperaron.
+        recovered = 0
+        for worker_id, thread in list(self.threads.items()):
+            if thread.is_alive():
+                continue
+            with self.lock:
+                lost_tile = self.in_flight.pop(worker_id, None)
+            if lost_tile is not None:
+                logging.warning(f"[worker {worker_id}] murió con {lost_tile['url']}; se reencola.")
+                retry_tiles.append(lost_tile)
+                recovered += 1
+            logging.warning(f"[worker {worker_id}] reiniciando worker.")
+            self._start_worker(worker_id)
+        return recovered
+
+    def run(self, tiles, on_result, on_failure=None, should_stop=lambda: False):
+        """
+        Reparte los tiles entre los workers. on_result(tile, cards_data) y
+        on_failure(tile, error) se llaman siempre desde este hilo, que es el único
+        que escribe el maestro y el checkpoint.
+        Si el iterador entrega None, no hay tiles por ahora (por ejemplo, un
+        rastreo adaptativo esperando resultados) y se vuelve a pedir después.
+        Retorna la lista de tiles que fallaron en todos sus intentos.
+        """
+        tiles = iter(tiles)
+        retry_tiles = deque()
+        failed_tiles = []
+        outstanding = 0
+        exhausted = False
+
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+
+        try:
+            while True:
+                stopping = should_stop()
+                outstanding -= self._supervise(retry_tiles)
+
+                # Al detener, los tiles que nadie ha tomado se descartan
+                while stopping:
+                    try:
+                        self.tile_queue.get_nowait()
+                        outstanding -= 1
+                    except queue.Empty:
+                        break
+
+                # Alimentar la cola sin bloquear: primero reintentos, luego tiles nuevos
+                while not stopping and not self.tile_queue.full():
+                    if retry_tiles:
+                        tile = retry_tiles.popleft()
+                    elif not exhausted:
+                        tile = next(tiles, _EXHAUSTED)
+                        if tile is _EXHAUSTED:
+                            exhausted = True
+                            continue
+                        if tile is None:
+                            break
+                    else:
+                        break
+                    self.tile_queue.put(tile)
+                    outstanding += 1
+
+                if outstanding == 0 and (stopping or (exhausted and not retry_tiles)):
+                    break
+
+                try:
+                    tile, cards_data, error = self.result_queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                outstanding -= 1
+
+                if error is None:
+                    on_result(tile, cards_data)
+                    continue
+
+                tile["attempts"] = tile.get("attempts", 0) + 1
+                if tile["attempts"] < MAX_TILE_ATTEMPTS and not stopping:
+                    retry_tiles.append(tile)
+                else:
+                    logging.error(f"Tile descartado tras {tile['attempts']} intentos: {tile['url']}")
+                    failed_tiles.append(tile)
+                    if on_failure is not None:
+                        on_failure(tile, error)
+        finally:
+            # Vaciar la cola y enviar la señal de salida a cada worker
+            while True:
+                try:
+                    self.tile_queue.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in self.threads:
+                self.tile_queue.put(None)
+            deadline = time.time() + 30
+            for thread in self.threads.values():
+                thread.join(timeout=max(0.0, deadline - time.time()))
+
+        return failed_tiles
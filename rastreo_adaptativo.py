@@ -0,0 +1,136 @@
+import logging
+from collections import deque
+
+from generador_urls import build_url_template, iter_tile_chunks, lat_lon_to_meters
+from ledger_tiles import DONE, tile_id
+from paginacion import RESULTS_PER_PAGE
+
+# Zoom máximo al que se subdivide un tile
+MAX_ZOOM = 22
+
+# Airbnb no muestra más de 15 páginas de 18 resultados por búsqueda
+SEARCH_RESULT_CAP = 270
+
+
+# Función que arma un tile (con URL e id) a partir de su bbox
+def make_tile(zoom_level, sw_lat, sw_lng, ne_lat, ne_lng, url_template=None):
+    url_template = url_template or build_url_template(zoom_level)
+    lat_meters, lon_meters = lat_lon_to_meters(ne_lat - sw_lat, ne_lng - sw_lng, (sw_lat + ne_lat) / 2)
+    return {
+        "url": url_template.format(ne_lat, ne_lng, sw_lat, sw_lng),
+        "sw_lat": sw_lat,
+        "sw_lng": sw_lng,
+        "ne_lat": ne_lat,
+        "ne_lng": ne_lng,
+        "zoom_level": zoom_level,
+        "tile_area_m2": float(lat_meters * lon_meters),
+        "source": None,
+        "index": None,
+        "tile_id": tile_id(zoom_level, sw_lat, sw_lng),
+    }
+
+
+# Función que genera la grilla inicial de un zoom grueso
+def root_tiles(south_lat, north_lat, west_lng, east_lng, tile_size_lat, tile_size_lng, zoom_level):
+    url_template = build_url_template(zoom_level)
+    for chunk in iter_tile_chunks(south_lat, north_lat, west_lng, east_lng,
+                                  tile_size_lat, tile_size_lng, zoom_level):
+        for sw_lat, sw_lng, ne_lat, ne_lng in zip(chunk["sw_lat"].tolist(), chunk["sw_lng"].tolist(),
+                                                  chunk["ne_lat"].tolist(), chunk["ne_lng"].tolist()):
+            yield make_tile(zoom_level, sw_lat, sw_lng, ne_lat, ne_lng, url_template)
+
+
+# Función que divide un tile en sus cuatro hijos del siguiente zoom
+def child_tiles(tile):
+    zoom_level = tile["zoom_level"] + 1
+    url_template = build_url_template(zoom_level)
+    mid_lat = (tile["sw_lat"] + tile["ne_lat"]) / 2
+    mid_lng = (tile["sw_lng"] + tile["ne_lng"]) / 2
+    return [
+        make_tile(zoom_level, tile["sw_lat"], tile["sw_lng"], mid_lat, mid_lng, url_template),
+        make_tile(zoom_level, tile["sw_lat"], mid_lng, mid_lat, tile["ne_lng"], url_template),
+        make_tile(zoom_level, mid_lat, tile["sw_lng"], tile["ne_lat"], mid_lng, url_template),
+        make_tile(zoom_level, mid_lat, mid_lng, tile["ne_lat"], tile["ne_lng"], url_template),
+    ]
+
+
+# Rastreo adaptativo en quadtree: un tile solo se subdivide si llegó al tope de resultados
+class QuadtreeCrawl:
+    def __init__(self, ledger, roots, card_cap, max_zoom=MAX_ZOOM, result_cap=SEARCH_RESULT_CAP):
+        """
+        - roots: tiles del zoom inicial.
+        - card_cap: número de tarjetas del tile a partir del cual está saturado
+          (una página, o todas las páginas con paginación).
+        - result_cap: total de resultados anunciado a partir del cual el tile está saturado.
+        """
+        self.ledger = ledger
+        self.roots = roots
+        self.card_cap = card_cap
+        self.max_zoom = max_zoom
+        self.result_cap = result_cap
+        self.frontier = deque()
+        self.in_flight = 0
+        self.visited = 0
+        self.subdivided = 0
+
+    def is_saturated(self, listing_yield, result_total):
+        if listing_yield is not None and listing_yield >= self.card_cap:
+            return True
+        if result_total is not None:
+            return result_total >= self.result_cap
+        # Sin total anunciado (el encabezado no coincidió), una primera página llena
+        # no dice cuántos resultados quedan: se subdivide para no perderlos
+        return listing_yield is not None and listing_yield >= RESULTS_PER_PAGE
+
+    def _expand(self, tile):
+        if tile["zoom_level"] >= self.max_zoom:
+            return
+        self.frontier.extend(child_tiles(tile))
+        self.subdivided += 1
+
+    def tiles(self):
+        """
+        Generador de tiles para el pool. Entrega None cuando no hay tiles
+        disponibles pero todavía hay tiles en curso que pueden subdividirse.
+        """
+        roots = iter(self.roots)
+        while True:
+            if not self.frontier:
+                root = next(roots, None)
+                if root is not None:
+                    self.frontier.append(root)
+                elif self.in_flight:
+                    yield None
+                    continue
+                else:
+                    break
+
+            tile = self.frontier.popleft()
+
+            # Al reanudar, los tiles terminados se expanden con lo guardado en el ledger
+            info = self.ledger.tile_info(tile["tile_id"])
+            if info is not None and info["status"] == DONE:
+                if self.is_saturated(info["listing_yield"], info["result_total"]):
+                    self._expand(tile)
+                continue
+
+            if not self.ledger.lease(tile):
+                continue
+            self.in_flight += 1
+            yield tile
+
+        logging.info(f"Rastreo adaptativo terminado: {self.visited} tiles visitados, "
+                     f"{self.subdivided} subdivididos.")
+
+    def on_result(self, tile, cards_data):
+        # Solo llegan resultados confirmados (tarjetas o aviso de "sin resultados");
+        # un timeout o un error pasan por on_failure y el tile queda fallido en el ledger
+        self.in_flight -= 1
+        self.visited += 1
+        if self.is_saturated(len(cards_data), tile.get("result_total")):
+            logging.info(f"Tile saturado ({len(cards_data)} tarjetas, total {tile.get('result_total')}); "
+                         f"subdividiendo {tile['tile_id']}.")
+            self._expand(tile)
+
+    def on_failure(self, tile, error=None):
+        self.in_flight -= 1
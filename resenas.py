@@ -0,0 +1,199 @@
+import os
+import json
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from enriquecimiento import AIRBNB_BASE_URL, JSON_SCRIPT_PATTERN, _walk_json, make_session
+from limitador import SHARED_LIMITER, limited_get, with_retries
+from metricas import METRICS
+from cache_respuestas import NotCachedError
+
+# Consulta persistida de reseñas de la web de Airbnb (el hash cambia con los
+# despliegues de Airbnb; se puede reemplazar con AIRBNB_REVIEWS_HASH)
+REVIEWS_OPERATION = "StaysPdpReviewsQuery"
+REVIEWS_QUERY_HASH = os.environ.get(
+    "AIRBNB_REVIEWS_HASH", "dec1c8061483e78373602047450322fd474e79ba9afa8d3dbbc27f504030f91d"
+)
+
+# Llave pública que la web de Airbnb envía en X-Airbnb-API-Key
+AIRBNB_API_KEY = os.environ.get("AIRBNB_API_KEY", "d306zoyjsyarp7ifhu67rjxn52tv0t20")
+
+# Reseñas por página de la consulta y máximo de páginas por publicación
+REVIEWS_PAGE_SIZE = 50
+MAX_REVIEW_PAGES = 20
+
+# Número máximo de publicaciones cuyas reseñas se descargan en paralelo
+REVIEW_WORKERS = 16
+
+
+# Función que convierte un nodo de reseña del JSON de Airbnb en un registro
+def parse_review(node):
+    rating = node.get("rating")
+    return {
+        "id": str(node["id"]) if node.get("id") is not None else None,
+        "date": node.get("createdAt"),
+        "rating": rating if isinstance(rating, (int, float)) else None,
+        "language": node.get("language"),
+    }
+
+
+# Función que busca las reseñas (nodos con comentario y fecha) dentro de un JSON
+def parse_reviews_payload(payload):
+    """
+    Retorna (reseñas, total anunciado o None)
+    """
+    reviews = []
+    total = None
+    for node in _walk_json(payload):
+        if "comments" in node and isinstance(node.get("createdAt"), str):
+            reviews.append(parse_review(node))
+        if total is None and isinstance(node.get("reviewsCount"), int):
+            total = node["reviewsCount"]
+    return reviews, total
+
+
+# Función que arma el resumen de reseñas de una publicación
+def summarize_reviews(reviews):
+    # Las fechas vienen en ISO 8601: el orden de texto es el orden cronológico
+    unique = list({(review["id"] or review["date"]): review for review in reviews}.values())
+    dates = [review["date"] for review in unique if review["date"]]
+    return {
+        "reviews": sorted(unique, key=lambda review: review["date"] or "", reverse=True),
+        "review_count": len(unique),
+        "latest_review_date": max(dates) if dates else None,
+        "earliest_review_date": min(dates) if dates else None,
+    }
+
+
+# Descarga de reseñas por HTTP (sin navegador), muchas publicaciones a la vez
+class ReviewFetcher:
+    def __init__(self, session=None, max_workers=REVIEW_WORKERS, page_size=REVIEWS_PAGE_SIZE,
+                 max_pages=MAX_REVIEW_PAGES, cache=None, limiter=SHARED_LIMITER):
+        """
+        - session: sesión de requests a reutilizar (por ejemplo, la de AirbnbScraper).
+        - cache: ListingCache opcional; las reseñas se vuelven a descargar
+          solo cuando vence el grupo review_history (una semana).
+        """
+        self.cache = cache
+        self.limiter = limiter
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.session = session or make_session(max_workers)
+
+    def _fetch_page(self, listing_id, offset):
+        variables = {
+            "id": base64.b64encode(f"StayListing:{listing_id}".encode()).decode(),
+            "pdpReviewsRequest": {
+                "fieldSelector": "for_p3_translation_only",
+                "forPreview": False,
+                "limit": self.page_size,
+                "first": self.page_size,
+                "offset": str(offset),
+                "showingTranslationButton": False,
+                "sortingPreference": "MOST_RECENT",
+            },
+        }
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": REVIEWS_QUERY_HASH}}
+        r = limited_get(
+            self.session, f"{AIRBNB_BASE_URL}/api/v3/{REVIEWS_OPERATION}/{REVIEWS_QUERY_HASH}", self.limiter,
+            params={
+                "operationName": REVIEWS_OPERATION,
+                "locale": "es-419",
+                "currency": "COP",
+                "variables": json.dumps(variables, separators=(",", ":")),
+                "extensions": json.dumps(extensions, separators=(",", ":")),
+            },
+            headers={"X-Airbnb-API-Key": AIRBNB_API_KEY},
+            timeout=30,
+        )
+        r.raise_for_status()
+        payload = r.json()
+        if payload.get("errors") and not payload.get("data"):
+            raise ValueError(payload["errors"][0].get("message", "Error en la consulta de reseñas"))
+        return parse_reviews_payload(payload)
+
+    def _fetch_reviews_page_html(self, listing_id):
+        # Respaldo: las primeras reseñas embebidas en /rooms/{id}/reviews
+        r = with_retries(lambda: limited_get(self.session, f"{AIRBNB_BASE_URL}/rooms/{listing_id}/reviews",
+                                             self.limiter, timeout=30),
+                         description=f"Reseñas HTML de {listing_id}")
+        reviews = []
+        for block in JSON_SCRIPT_PATTERN.findall(r.text):
+            try:
+                reviews.extend(parse_reviews_payload(json.loads(block))[0])
+            except ValueError:
+                continue
+        return reviews
+
+    def fetch_reviews(self, listing_id):
+        """
+        Retorna el resumen de reseñas de una publicación: lista de reseñas
+        (fecha, calificación, idioma) y fechas de la más reciente y la más antigua.
+        "complete" es False si la paginación se cortó o se usó la página HTML.
+        """
+        reviews = []
+        complete = False
+        try:
+            for page in range(self.max_pages):
+                page_reviews, total = with_retries(
+                    lambda: self._fetch_page(listing_id, page * self.page_size),
+                    description=f"Reseñas de {listing_id}")
+                reviews.extend(page_reviews)
+                if len(page_reviews) < self.page_size or (total is not None and len(reviews) >= total):
+                    break
+            complete = True
+        except Exception as e:
+            if reviews:
+                logging.warning(f"Reseñas incompletas para la publicación {listing_id}: {e}")
+            else:
+                logging.warning(f"Consulta de reseñas falló para {listing_id} ({e}); usando la página HTML.")
+                reviews = self._fetch_reviews_page_html(listing_id)
+        summary = summarize_reviews(reviews)
+        summary["complete"] = complete
+        return summary
+
+    def fetch_many(self, ids):
+        """
+        Descarga las reseñas de un lote de publicaciones en paralelo.
+        Retorna un diccionario id -> resumen de reseñas. Las publicaciones cuya
+        descarga falló (o, sin red, cuyas reseñas no se grabaron) no aparecen,
+        para no reemplazar en el maestro las reseñas que ya tenían.
+        """
+        unique_ids = [i for i in dict.fromkeys(ids) if i != "unknown"]
+        summaries = {}
+        if not unique_ids:
+            return summaries
+
+        if self.cache is not None:
+            for listing_id, cached in self.cache.get_many(unique_ids, ("review_history",)).items():
+                summaries[listing_id] = summarize_reviews(cached["reviews"])
+        pending = [i for i in unique_ids if i not in summaries]
+        if self.cache is not None:
+            METRICS.inc("cache_hits", len(summaries))
+            METRICS.inc("cache_misses", len(pending))
+        if not pending:
+            return summaries
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            # Los workers cuentan en la etapa del llamador (reviews) para el perfilador
+            fetch_reviews = METRICS.propagate(self.fetch_reviews)
+            futures = {executor.submit(fetch_reviews, i): i for i in pending}
+            for future in as_completed(futures):
+                listing_id = futures[future]
+                try:
+                    fetched[listing_id] = future.result()
+                except NotCachedError:
+                    logging.warning(f"Las reseñas de {listing_id} no están en la caché de respuestas; se omiten.")
+                except Exception as e:
+                    logging.error(f"Error descargando las reseñas de {listing_id}: {e}; se omiten.")
+
+        if self.cache is not None:
+            # Solo las descargas completas: una lista cortada no vale por una semana
+            self.cache.put_many({i: {"reviews": summary["reviews"]} for i, summary in fetched.items()
+                                 if summary["complete"]})
+        summaries.update(fetched)
+        return summaries
+
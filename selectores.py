@@ -0,0 +1,13 @@
+# Clases CSS (con hash, cambian cuando Airbnb despliega) de la tarjeta de búsqueda
+# y de cada campo. Las usan el script del navegador (main.py), la espera de
+# resultados (esperas.py), el parser de páginas guardadas (--replay) y el servidor
+# local (servidor_local.py): al rotar las clases basta con cambiarlas aquí
+CARD_CLASSES = {
+    "card": "cy5jw6o",
+    "link": "bn2bl2p",
+    "location": "t1jojoys",
+    "description": "s1cjsi4j",
+    "image": "itu7ddv",
+    "price": "_11jcbg2",
+    "rating": "r4a59j5",
+}
@@ -0,0 +1,311 @@
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import logging
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from indice_espacial import SpatialIndex
+from paginacion import MAX_PAGES, RESULTS_PER_PAGE
+from cache_respuestas import HTTP, SEARCH_PAGE, ResponseCache
+from generador_urls import south_latitude, north_latitude, west_longitude, east_longitude
+from selectores import CARD_CLASSES
+
+# Publicaciones de la ciudad sintética y semilla por defecto
+DEFAULT_LISTINGS = 20000
+DEFAULT_SEED = 7
+
+# Centros de densidad de la ciudad sintética (lat, lng, desviación en grados, peso)
+CLUSTERS = [
+    (4.655, -74.055, 0.012, 0.45),   # Chapinero / Zona G
+    (4.600, -74.072, 0.008, 0.20),   # La Candelaria
+    (4.695, -74.035, 0.010, 0.20),   # Usaquén
+    (4.690, -74.110, 0.025, 0.15),   # Occidente, más disperso
+]
+
+# Tipos de alojamiento y barrios que aparecen en las tarjetas
+ROOM_TYPES = [("Apartamento", "Entire home/apt"), ("Habitación", "Private room"), ("Casa", "Entire home/apt")]
+NEIGHBORHOODS = ["Chapinero", "La Candelaria", "Usaquén", "Teusaquillo", "Suba", "Kennedy"]
+
+# Reseñas máximas por publicación sintética
+MAX_REVIEWS = 80
+
+
+# Función que genera una semilla estable a partir de un id (independiente de PYTHONHASHSEED)
+def _stable_seed(*parts):
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+# Ciudad sintética: publicaciones deterministas por semilla y consultas por bbox
+class SyntheticCity:
+    def __init__(self, listings=DEFAULT_LISTINGS, seed=DEFAULT_SEED):
+        self.seed = seed
+        self.index = SpatialIndex()
+        rng = random.Random(seed)
+        weights = [cluster[3] for cluster in CLUSTERS]
+        for n in range(listings):
+            lat0, lng0, spread, _ = rng.choices(CLUSTERS, weights)[0]
+            lat = min(north_latitude, max(south_latitude, rng.gauss(lat0, spread)))
+            lng = min(east_longitude, max(west_longitude, rng.gauss(lng0, spread)))
+            self.index.insert(str(10 ** 17 + n * 7919), lat, lng)
+
+    def search(self, sw_lat, sw_lng, ne_lat, ne_lng):
+        # Orden estable: la misma búsqueda siempre entrega las mismas páginas
+        return sorted(self.index.query_bbox(sw_lat, sw_lng, ne_lat, ne_lng))
+
+    def listing(self, listing_id):
+        """
+        Retorna los campos de la publicación, o None si no existe
+        """
+        position = self.index.positions.get(listing_id)
+        if position is None:
+            return None
+        rng = random.Random(_stable_seed(self.seed, listing_id))
+        kind, room_type = rng.choice(ROOM_TYPES)
+        neighborhood = rng.choice(NEIGHBORHOODS)
+        review_count = rng.randint(0, MAX_REVIEWS)
+        return {
+            "id": listing_id,
+            "lat": position[0],
+            "lng": position[1],
+            "kind": kind,
+            "room_type": room_type,
+            "title": f"{kind} en {neighborhood}",
+            "neighborhood": neighborhood,
+            "capacity": rng.randint(1, 8),
+            "price": rng.randrange(80, 900) * 1000,
+            "rating": round(rng.uniform(3.8, 5.0), 2),
+            "review_count": review_count,
+        }
+
+    def reviews(self, listing):
+        rng = random.Random(_stable_seed(self.seed, listing["id"], "reviews"))
+        day = datetime(2024, 6, 1)
+        reviews = []
+        for n in range(listing["review_count"]):
+            day -= timedelta(days=rng.randint(1, 20))
+            reviews.append({
+                "__typename": "PdpReview",
+                "id": str(_stable_seed(listing["id"], n) % 10 ** 12),
+                "comments": "Excelente ubicación.",
+                "createdAt": day.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "rating": rng.randint(3, 5),
+                "language": rng.choice(["es", "en"]),
+            })
+        return reviews
+
+
+# Función que arma el HTML de una página de resultados con el marcado de las tarjetas reales
+def render_search_page(listings, total):
+    cards = []
+    for listing in listings:
+        cards.append(
+            f'<div class="{CARD_CLASSES["card"]}">'
+            f'<a class="{CARD_CLASSES["link"]}" href="/rooms/{listing["id"]}?source_impression_id=p3"></a>'
+            f'<img class="{CARD_CLASSES["image"]}" src="/im/{listing["id"]}.jpg">'
+            f'<div class="{CARD_CLASSES["location"]}">{listing["kind"]} en {listing["neighborhood"]}</div>'
+            f'<div class="{CARD_CLASSES["description"]}">{listing["title"]}</div>'
+            f'<span class="{CARD_CLASSES["price"]}">$ {listing["price"]:,} COP</span>'
+            f'<span class="{CARD_CLASSES["rating"]}">{listing["rating"]} ({listing["review_count"]})</span>'
+            f'</div>'
+        )
+    if total == 0:
+        heading = "<h1>No hay coincidencias exactas</h1>"
+    elif total > 1000:
+        heading = "<h1>Más de 1.000 alojamientos</h1>"
+    else:
+        heading = f"<h1>{total} alojamientos</h1>"
+    return f"<html><body>{heading}{''.join(cards)}</body></html>"
+
+
+# Función que arma el HTML de /rooms/{id} con el JSON embebido que lee parse_room_page
+def render_room_page(listing, reviews):
+    state = {"niobeMinimalClientData": [{"data": {"presentation": {"stayProductDetailPage": {"sections": {
+        "metadata": {"listingTitle": listing["title"], "roomTypeCategory": listing["room_type"],
+                     "personCapacity": listing["capacity"], "reviewCount": listing["review_count"],
+                     "overallRating": listing["rating"]},
+        "location": {"lat": listing["lat"], "lng": listing["lng"]},
+        "description": {"htmlDescription": {"htmlText": f"<p>{listing['title']}</p>"}},
+        "reviews": reviews[:6],
+    }}}}}]}
+    return (f'<html><body><script id="data-deferred-state" type="application/json">'
+            f'{json.dumps(state)}</script></body></html>')
+
+
+# Manejador HTTP: búsqueda, /rooms/{id}, /rooms/{id}/reviews y la consulta de reseñas
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug(f"Servidor local: {format % args}")
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        parts = urllib.parse.urlsplit(self.path)
+        error = fixture.inject()
+        if error is not None:
+            self._send(error, f"Error inyectado {error}")
+            return
+
+        recorded = fixture.recorded.get(self.path)
+        if recorded is not None:
+            self._send(200, recorded["body"], recorded["content_type"] or "text/html; charset=utf-8")
+            return
+
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        segments = [urllib.parse.unquote(s) for s in parts.path.split("/") if s]
+        if segments[:1] == ["s"]:
+            self._send(200, fixture.search_page(params))
+        elif len(segments) >= 2 and segments[0] == "rooms":
+            listing = fixture.city.listing(segments[1])
+            if listing is None:
+                self._send(404, "No existe")
+            else:
+                # /rooms/{id}/reviews usa el mismo marcado con las primeras reseñas embebidas
+                self._send(200, render_room_page(listing, fixture.city.reviews(listing)))
+        elif segments[:2] == ["api", "v3"]:
+            self._send(200, json.dumps(fixture.reviews_payload(params)), "application/json")
+        else:
+            self._send(404, "No existe")
+
+
+# Servidor local que imita a Airbnb: páginas grabadas (caché de respuestas) o ciudad sintética
+class FixtureServer:
+    def __init__(self, host="127.0.0.1", port=0, city=None, recorded_dir=None,
+                 latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=DEFAULT_SEED):
+        """
+        - recorded_dir: carpeta de una caché de respuestas (--response-cache); sus
+          páginas se sirven tal cual y el resto sale de la ciudad sintética.
+        - latency, jitter: segundos de espera por petición (media y variación uniforme).
+        - error_rate, throttle_rate: fracción de respuestas 503 y 429.
+        """
+        self.city = city or SyntheticCity(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests = 0
+        self.recorded = self._load_recorded(recorded_dir) if recorded_dir else {}
+        self.httpd = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fixture = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _load_recorded(self, recorded_dir):
+        cache = ResponseCache(recorded_dir)
+        recorded = {}
+        try:
+            for kind in (SEARCH_PAGE, HTTP):
+                for entry in cache.iter_entries(kind):
+                    parts = urllib.parse.urlsplit(entry["url"])
+                    path = parts.path + (f"?{parts.query}" if parts.query else "")
+                    recorded[path] = {"body": cache.read_body(entry["digest"]),
+                                      "content_type": entry["content_type"]}
+        finally:
+            cache.close()
+        logging.info(f"Servidor local: {len(recorded)} respuestas grabadas.")
+        return recorded
+
+    def inject(self):
+        """
+        Espera la latencia configurada y decide si la petición falla.
+        Retorna el código de error a devolver, o None.
+        """
+        with self.rng_lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            roll = self.rng.random()
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def search_page(self, params):
+        try:
+            bbox = [float(params[key]) for key in ("sw_lat", "sw_lng", "ne_lat", "ne_lng")]
+        except (KeyError, ValueError):
+            return render_search_page([], 0)
+        ids = self.city.search(*bbox)
+        offset = int(params.get("items_offset", 0) or 0)
+        # Airbnb no muestra más allá de MAX_PAGES páginas
+        page_ids = ids[offset:offset + RESULTS_PER_PAGE] if offset < MAX_PAGES * RESULTS_PER_PAGE else []
+        return render_search_page([self.city.listing(i) for i in page_ids], len(ids))
+
+    def reviews_payload(self, params):
+        variables = json.loads(params.get("variables", "{}"))
+        stay_id = base64.b64decode(variables.get("id", "")).decode("utf-8", errors="replace")
+        request = variables.get("pdpReviewsRequest", {})
+        listing = self.city.listing(stay_id.split(":")[-1])
+        if listing is None:
+            return {"errors": [{"message": "Publicación no encontrada"}]}
+        offset = int(request.get("offset", 0))
+        limit = int(request.get("limit", 50))
+        reviews = self.city.reviews(listing)[offset:offset + limit]
+        return {"data": {"presentation": {"stayProductDetailPage": {"reviews": {
+            "metadata": {"reviewsCount": listing["review_count"]},
+            "reviews": reviews,
+        }}}}}
+
+    def start(self):
+        # Atiende en un hilo de fondo y retorna la URL base (para AIRBNB_BASE_URL)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a Airbnb para pruebas y benchmarks")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--listings", type=int, default=DEFAULT_LISTINGS,
+                        help=f"Publicaciones de la ciudad sintética (por defecto {DEFAULT_LISTINGS})")
+    parser.add_argument("--recorded", metavar="DIR", default=None,
+                        help="Caché de respuestas grabada con --response-cache para servir tal cual")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por petición")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación uniforme de la espera")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FixtureServer(port=args.port, city=SyntheticCity(args.listings, args.seed),
+                           recorded_dir=args.recorded, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+    print(f"Servidor local en {server.base_url} (AIRBNB_BASE_URL={server.base_url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
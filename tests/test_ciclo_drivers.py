@@ -0,0 +1,58 @@
+import threading
+
+from ciclo_drivers import DriverManager
+
+
+class FakeDriver:
+    def __init__(self, number):
+        self.number = number
+        self.session_id = f"sesion-{number}"
+
+    def quit(self):
+        pass
+
+
+class CountingSetup:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            return FakeDriver(self.calls)
+
+
+def test_crash_with_ready_standby_swaps_it_in():
+    setup = CountingSetup()
+    drivers = DriverManager(setup, max_pages=10, max_rss_mb=None)
+    try:
+        first = drivers.get()
+        # 8 de 10 páginas: se lanza la reserva
+        for _ in range(8):
+            drivers.page_done()
+        standby = drivers.standby_future.result()
+        assert setup.calls == 2
+
+        # El navegador cae (WebDriverException): el siguiente get usa la reserva
+        first.session_id = None
+        assert drivers.get() is standby
+        assert setup.calls == 2
+    finally:
+        drivers.close()
+
+
+def test_zero_lead_keeps_a_standby_for_early_crashes():
+    setup = CountingSetup()
+    drivers = DriverManager(setup, max_pages=500, max_rss_mb=None, standby_lead=0)
+    try:
+        drivers.get()
+        standby = drivers.standby_future.result()
+
+        drivers.discard()
+        assert drivers.get() is standby
+        # La reserva usada se repone en segundo plano
+        drivers.standby_future.result()
+        assert setup.calls == 3
+    finally:
+        drivers.close()
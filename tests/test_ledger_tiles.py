@@ -0,0 +1,36 @@
+import os
+import sqlite3
+
+from ledger_tiles import DONE, FAILED, TileLedger, tile_id
+
+
+def make_tile(sw_lat):
+    return {"tile_id": tile_id(16, sw_lat, -74.1), "zoom_level": 16, "sw_lat": sw_lat, "sw_lng": -74.1,
+            "ne_lat": sw_lat + 0.01, "ne_lng": -74.09, "url": f"https://example.test/{sw_lat}"}
+
+
+def test_timeout_migration_runs_once(tmp_path):
+    filepath = os.path.join(tmp_path, "tile_ledger.sqlite")
+    legacy, current = make_tile(4.6), make_tile(4.7)
+
+    # Ledger anterior al esquema versionado con un timeout dado por terminado
+    ledger = TileLedger(filepath)
+    ledger.lease(legacy)
+    ledger.mark_done(legacy, 0)
+    ledger.close()
+    conn = sqlite3.connect(filepath)
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+
+    ledger = TileLedger(filepath)
+    assert ledger.tile_info(legacy["tile_id"])["status"] == FAILED
+
+    # Un tile terminado hoy con 0 tarjetas y el total sin leer sigue terminado al reabrir
+    ledger.lease(current)
+    ledger.mark_done(current, 0)
+    ledger.close()
+    ledger = TileLedger(filepath)
+    try:
+        assert ledger.tile_info(current["tile_id"])["status"] == DONE
+    finally:
+        ledger.close()
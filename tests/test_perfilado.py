@@ -0,0 +1,29 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metricas import Metrics
+from perfilado import StageProfiler
+
+
+def test_pool_workers_are_sampled_in_the_callers_stage(tmp_path):
+    metrics = Metrics()
+    profiler = StageProfiler(str(tmp_path), stages=["enrich"], trace_memory=False, metrics=metrics)
+    started, release = threading.Event(), threading.Event()
+
+    def fetch_room():
+        started.set()
+        release.wait(5)
+
+    with metrics.timer("enrich"):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(metrics.propagate(fetch_room))
+            started.wait(5)
+            profiler._sample()
+            release.set()
+            future.result()
+
+    worker_stacks = [stack for stack in profiler.stacks if "fetch_room" in stack]
+    assert worker_stacks and all(stack.startswith("enrich;") for stack in worker_stacks)
+    # La duración la mide solo el hilo que espera
+    assert metrics.stages["enrich"].histogram.total == 1
+    assert metrics.active == {}
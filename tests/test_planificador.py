@@ -0,0 +1,40 @@
+import os
+
+from generador_urls import adjust_tile_size_by_zoom
+from indice_espacial import SpatialIndex
+from ledger_tiles import TileLedger, tile_id
+from planificador import YieldScheduler
+
+SOUTH, WEST, SIZE = 4.5, -74.2, 0.0002
+
+
+def grid_tile(zoom_level, row, col, source, index):
+    size = adjust_tile_size_by_zoom(SIZE, zoom_level)
+    sw_lat, sw_lng = SOUTH + row * size, WEST + col * size
+    return {"tile_id": tile_id(zoom_level, sw_lat, sw_lng), "zoom_level": zoom_level,
+            "sw_lat": sw_lat, "sw_lng": sw_lng, "ne_lat": sw_lat + size, "ne_lng": sw_lng + size,
+            "url": f"https://example.test/{zoom_level}/{row}/{col}", "source": source, "index": index}
+
+
+def test_next_file_waits_for_tiles_in_flight(tmp_path):
+    ledger = TileLedger(os.path.join(tmp_path, "tile_ledger.sqlite"))
+    parent = grid_tile(14, 0, 0, "zoom_14", 0)
+    # En el archivo, el tile fuera del padre va primero
+    outside = grid_tile(16, 8, 8, "zoom_16", 0)
+    inside = grid_tile(16, 1, 1, "zoom_16", 1)
+    files = {"zoom_14": [parent], "zoom_16": [outside, inside]}
+
+    scheduler = YieldScheduler(ledger, SpatialIndex(), SOUTH, WEST, SIZE, SIZE, probe_rate=1.0)
+    tiles = scheduler.schedule([parent, outside, inside], lambda source, index: files[source][index])
+    try:
+        assert next(tiles) is parent
+        # El padre sigue en un worker: no se planifica el zoom 16 todavía
+        assert next(tiles) is None
+        assert next(tiles) is None
+
+        # El escritor recibe 18 tarjetas del padre (el log aún no lo marcó en el ledger)
+        scheduler.on_result(parent, [{}] * 18)
+        assert next(tiles) is inside
+        assert next(tiles) is outside
+    finally:
+        ledger.close()
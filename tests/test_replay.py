@@ -0,0 +1,43 @@
+import os
+import time
+
+import main
+from almacenamiento import SQLiteMasterStore
+from cache_respuestas import SEARCH_PAGE, ResponseCache
+from enriquecimiento import AIRBNB_BASE_URL
+from servidor_local import SyntheticCity, render_room_page, render_search_page
+
+
+def test_replay_does_not_overwrite_newer_observation(tmp_path, monkeypatch):
+    master_filepath = os.path.join(tmp_path, "airbnb_master_listings.json")
+    monkeypatch.setattr(main, "MASTER_FILEPATH", master_filepath)
+
+    city = SyntheticCity(listings=50)
+    known, recorded = [city.listing(i) for i in sorted(city.index.positions)[:2]]
+
+    # Página de búsqueda y publicaciones grabadas hace un día
+    cache = ResponseCache(os.path.join(tmp_path, main.RESPONSE_CACHE_DIR))
+    cache.put("https://www.airbnb.com.co/s/bogota/homes", render_search_page([known, recorded], 2),
+              SEARCH_PAGE, meta={"sw_lat": 4.5, "sw_lng": -74.2, "ne_lat": 4.8, "ne_lng": -74.0,
+                                 "zoom_level": 16})
+    for listing in (known, recorded):
+        cache.put(f"{AIRBNB_BASE_URL}/rooms/{listing['id']}", render_room_page(listing, []),
+                  content_type="text/html")
+    with cache.conn:
+        cache.conn.execute("UPDATE responses SET fetched_at = ?", (time.time() - 86400,))
+    cache.close()
+
+    # Observación más reciente del mismo zoom ya en el maestro
+    store = main.open_master_store("sqlite", master_filepath)
+    store.add_cards([{"id": known["id"], "zoom_level": 16, "title": "Observación reciente",
+                      "latitude": 4.6, "longitude": -74.1}], observed_at=time.time())
+    store.close()
+
+    main.replay_responses(storage="sqlite")
+
+    store = SQLiteMasterStore(os.path.join(tmp_path, "airbnb_master_listings.sqlite"))
+    try:
+        assert store.get(known["id"])["title"] == "Observación reciente"
+        assert store.get(recorded["id"])["title"] == recorded["title"]
+    finally:
+        store.close()
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from almacenamiento import JsonMasterStore, ListingLog, SQLiteMasterStore
+from resenas import ReviewFetcher, summarize_reviews
+
+REVIEWS = [{"id": "1", "date": "2024-05-01T00:00:00Z", "rating": 5, "language": "es"}]
+
+
+def open_store(kind, tmp_path):
+    master_filepath = os.path.join(tmp_path, "master.json")
+    if kind == "sqlite":
+        return SQLiteMasterStore(os.path.join(tmp_path, "master.sqlite"))
+    if kind == "log":
+        return ListingLog(master_filepath, os.path.join(tmp_path, "log"))
+    return JsonMasterStore(master_filepath)
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "log", "json"])
+def test_card_without_reviews_keeps_stored_reviews(kind, tmp_path):
+    store = open_store(kind, tmp_path)
+    store.add_cards([{"id": "7", "zoom_level": 16, "price": "$ 1", "reviews": REVIEWS,
+                      "first_comment_date": "2024-05-01T00:00:00Z"}])
+    store.add_cards([{"id": "7", "zoom_level": 16, "price": "$ 2"}])
+    record = store.to_dataframe().set_index("id").loc["7"]
+    store.close()
+
+    assert record["price"] == "$ 2"
+    assert list(record["reviews"]) == REVIEWS
+    assert record["first_comment_date"] == "2024-05-01T00:00:00Z"
+
+
+class FlakyFetcher(ReviewFetcher):
+    def fetch_reviews(self, listing_id):
+        if listing_id == "caido":
+            raise ConnectionError("sin respuesta")
+        summary = summarize_reviews(REVIEWS)
+        summary["complete"] = listing_id != "cortado"
+        return summary
+
+
+class RecordingCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get_many(self, ids, groups):
+        return {}
+
+    def put_many(self, entries):
+        self.stored.update(entries)
+
+
+def test_fetch_many_omits_failures_and_caches_only_complete_fetches():
+    cache = RecordingCache()
+    summaries = FlakyFetcher(session=object(), cache=cache).fetch_many(["bien", "cortado", "caido"])
+
+    assert set(summaries) == {"bien", "cortado"}
+    assert set(cache.stored) == {"bien"}
@@ -0,0 +1,293 @@
+import os
+import json
+import struct
+import logging
+from array import array
+import numpy as np
+
+# Índice de desplazamientos: archivo hermano <archivo>.idx con una cabecera
+# (tamaño y mtime del archivo de tiles) y el byte donde empieza cada línea
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"TILEIDX1"
+INDEX_HEADER = struct.Struct("<8sQQ")
+
+# Tamaño del bloque de lectura al construir el índice
+READ_CHUNK = 1024 * 1024
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Función que recorre el archivo una vez y guarda el byte de inicio de cada línea
+def build_offset_index(path):
+    offsets = array("Q")
+    position = 0
+    at_line_start = True
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(READ_CHUNK)
+            if not chunk:
+                break
+            start = 0
+            while True:
+                if at_line_start and start < len(chunk):
+                    offsets.append(position + start)
+                    at_line_start = False
+                newline = chunk.find(b"\n", start)
+                if newline == -1:
+                    break
+                start = newline + 1
+                at_line_start = True
+            position += len(chunk)
+
+    size, mtime_ns = _file_signature(path)
+    with open(path + INDEX_SUFFIX, "wb") as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime_ns))
+        offsets.tofile(index_file)
+    return offsets
+
+
+# Función que carga el índice, reconstruyéndolo si el archivo de tiles cambió
+def load_offset_index(path):
+    index_path = path + INDEX_SUFFIX
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as index_file:
+            header = index_file.read(INDEX_HEADER.size)
+            if len(header) == INDEX_HEADER.size:
+                magic, size, mtime_ns = INDEX_HEADER.unpack(header)
+                if magic == INDEX_MAGIC and (size, mtime_ns) == _file_signature(path):
+                    offsets = array("Q")
+                    offsets.frombytes(index_file.read())
+                    return offsets
+    logging.info(f"Construyendo índice de desplazamientos para {path}")
+    return build_offset_index(path)
+
+
+def count_tiles(path):
+    if path.endswith(BINARY_SUFFIX):
+        return len(BinaryTileFile(path))
+    return len(load_offset_index(path))
+
+
+def iter_tile_records(path, start=0):
+    """
+    Recorre los tiles de un archivo JSONL (o binario .tiles) de forma perezosa
+    desde la posición start. Retorna tuplas (posición, registro) sin cargar
+    el archivo completo.
+    """
+    if path.endswith(BINARY_SUFFIX):
+        yield from BinaryTileFile(path).iter_records(start)
+        return
+
+    offsets = load_offset_index(path)
+    if start >= len(offsets):
+        return
+    with open(path, "rb") as file:
+        file.seek(offsets[start])
+        for index, line in enumerate(file, start=start):
+            line = line.strip()
+            if not line:
+                continue
+            yield index, json.loads(line)
+
+
+# Formato binario de tiles (.tiles):
+#   - 8 bytes mágicos y la longitud de la cabecera (uint32)
+#   - cabecera JSON: zoom, número de tiles, plantilla de URL, place_id y columnas
+#   - relleno hasta múltiplo de 8 bytes
+#   - una columna float64 por campo (sw_lat, sw_lng, ne_lat, ne_lng, tile_area_m2)
+# Las URLs no se guardan: se generan al leer a partir de la plantilla
+BINARY_SUFFIX = ".tiles"
+BINARY_MAGIC = b"AIRTILE1"
+BINARY_PREFIX = struct.Struct("<8sI")
+BINARY_COLUMNS = ("sw_lat", "sw_lng", "ne_lat", "ne_lng", "tile_area_m2")
+BINARY_DTYPE = "<f8"
+
+
+def _binary_data_offset(header_bytes):
+    offset = BINARY_PREFIX.size + len(header_bytes)
+    return offset + (-offset % 8)
+
+
+# Función que escribe un archivo .tiles a partir de bloques de arreglos de NumPy
+def write_binary_tiles(path, zoom_level, count, chunks, url_template, place_id=None):
+    """
+    - count: número total de tiles (se reserva el espacio de cada columna).
+    - chunks: bloques con los arreglos de BINARY_COLUMNS, en orden.
+    - url_template: plantilla con cuatro campos {!r}: ne_lat, ne_lng, sw_lat, sw_lng.
+    """
+    header = {
+        "zoom_level": int(zoom_level),
+        "count": int(count),
+        "url_template": url_template,
+        "place_id": place_id,
+        "columns": list(BINARY_COLUMNS),
+        "dtype": BINARY_DTYPE,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_offset = _binary_data_offset(header_bytes)
+
+    with open(path, "wb") as file:
+        file.write(BINARY_PREFIX.pack(BINARY_MAGIC, len(header_bytes)))
+        file.write(header_bytes)
+        file.write(b"\0" * (data_offset - file.tell()))
+        file.truncate(data_offset + count * len(BINARY_COLUMNS) * 8)
+
+    columns = np.memmap(path, dtype=BINARY_DTYPE, mode="r+", offset=data_offset,
+                        shape=(len(BINARY_COLUMNS), count))
+    written = 0
+    for chunk in chunks:
+        size = len(chunk[BINARY_COLUMNS[0]])
+        for column_index, column in enumerate(BINARY_COLUMNS):
+            columns[column_index, written:written + size] = chunk[column]
+        written += size
+    columns.flush()
+    del columns
+
+    if written != count:
+        raise ValueError(f"Se esperaban {count} tiles y se escribieron {written}.")
+    return written
+
+
+# Archivo .tiles mapeado en memoria: carga instantánea y acceso directo por posición
+class BinaryTileFile:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            magic, header_length = BINARY_PREFIX.unpack(file.read(BINARY_PREFIX.size))
+            if magic != BINARY_MAGIC:
+                raise ValueError(f"{path} no es un archivo de tiles binario.")
+            header_bytes = file.read(header_length)
+        self.header = json.loads(header_bytes)
+        self.zoom_level = self.header["zoom_level"]
+        self.url_template = self.header["url_template"]
+        self.count = self.header["count"]
+        columns = np.memmap(path, dtype=self.header["dtype"], mode="r",
+                            offset=_binary_data_offset(header_bytes),
+                            shape=(len(self.header["columns"]), self.count))
+        self.columns = dict(zip(self.header["columns"], columns))
+
+    def __len__(self):
+        return self.count
+
+    def render_url(self, sw_lat, sw_lng, ne_lat, ne_lng):
+        return self.url_template.format(ne_lat, ne_lng, sw_lat, sw_lng)
+
+    def record(self, index):
+        sw_lat = float(self.columns["sw_lat"][index])
+        sw_lng = float(self.columns["sw_lng"][index])
+        ne_lat = float(self.columns["ne_lat"][index])
+        ne_lng = float(self.columns["ne_lng"][index])
+        return {
+            "zoom_level": self.zoom_level,
+            "sw_lat": sw_lat,
+            "sw_lng": sw_lng,
+            "ne_lat": ne_lat,
+            "ne_lng": ne_lng,
+            "tile_area_m2": float(self.columns["tile_area_m2"][index]),
+            "url": self.render_url(sw_lat, sw_lng, ne_lat, ne_lng),
+        }
+
+    def iter_records(self, start=0, block=4096):
+        # Se leen bloques de la columna para no convertir valor a valor desde el memmap
+        for first in range(start, self.count, block):
+            last = min(first + block, self.count)
+            values = [self.columns[column][first:last].tolist() for column in BINARY_COLUMNS]
+            for offset, (sw_lat, sw_lng, ne_lat, ne_lng, area) in enumerate(zip(*values)):
+                yield first + offset, {
+                    "zoom_level": self.zoom_level,
+                    "sw_lat": sw_lat,
+                    "sw_lng": sw_lng,
+                    "ne_lat": ne_lat,
+                    "ne_lng": ne_lng,
+                    "tile_area_m2": area,
+                    "url": self.render_url(sw_lat, sw_lng, ne_lat, ne_lng),
+                }
+
+    def export_jsonl(self, json_file):
+        """
+        Exporta el archivo al formato JSONL original (una línea por tile)
+        """
+        with open(json_file, "w", encoding="utf-8") as file:
+            for _, record in self.iter_records():
+                json.dump(record, file, ensure_ascii=False)
+                file.write("\n")
+        return self.count
+
+
+# Lector con acceso directo por posición a un archivo de tiles (JSONL o .tiles)
+class TileFileReader:
+    def __init__(self, path):
+        self.path = path
+        self.binary = None
+        self.file = None
+        if path.endswith(BINARY_SUFFIX):
+            self.binary = BinaryTileFile(path)
+        else:
+            self.offsets = load_offset_index(path)
+            self.file = open(path, "rb")
+
+    def record(self, index):
+        if self.binary is not None:
+            return self.binary.record(index)
+        self.file.seek(self.offsets[index])
+        return json.loads(self.file.readline())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+# Función que elige el archivo .tiles si existe junto al JSONL indicado
+def resolve_tile_file(path):
+    base, extension = os.path.splitext(path)
+    if extension != BINARY_SUFFIX and os.path.exists(base + BINARY_SUFFIX):
+        return base + BINARY_SUFFIX
+    return path
+
+
+# Cursor de reanudación: la posición hasta la cual todos los tiles de un
+# archivo están terminados, para saltar directo ahí en la siguiente ejecución
+class ResumeCursor:
+    def __init__(self, load_position, save_position, save_every=50):
+        """
+        - load_position(source) -> posición guardada (0 si no hay).
+        - save_position(source, position): persiste la posición.
+        """
+        self.load_position = load_position
+        self.save_position = save_position
+        self.save_every = save_every
+        self.positions = {}
+        self.finished = {}
+        self.unsaved = {}
+
+    def start(self, source):
+        if source not in self.positions:
+            self.positions[source] = self.load_position(source)
+            self.finished[source] = set()
+            self.unsaved[source] = 0
+        return self.positions[source]
+
+    def mark(self, source, index):
+        if index < self.start(source):
+            return
+        finished = self.finished[source]
+        finished.add(index)
+        position = self.positions[source]
+        while position in finished:
+            finished.discard(position)
+            position += 1
+        if position != self.positions[source]:
+            self.unsaved[source] += position - self.positions[source]
+            self.positions[source] = position
+            if self.unsaved[source] >= self.save_every:
+                self.flush(source)
+
+    def flush(self, source=None):
+        sources = [source] if source is not None else list(self.positions)
+        for name in sources:
+            if self.unsaved.get(name):
+                self.save_position(name, self.positions[name])
+                self.unsaved[name] = 0